@@ -6,6 +6,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from app.database import Base
+from app import models  # noqa: F401  (registers the tables on Base.metadata)
 from app.config import settings
 
 # this is the Alembic Config object, which provides
@@ -28,6 +29,17 @@ target_metadata = Base.metadata
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
+# The search objects are created with raw DDL (see models.BOOK_SEARCH_DDL):
+# the SQLite FTS5 table with its shadow tables, and the PostgreSQL trigram
+# index. Autogenerate must not try to drop them.
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and name.startswith("books_fts"):
+        return False
+    if type_ == "index" and name == "ix_books_search_trgm":
+        return False
+    return True
+
+
 DATABASE_URL = settings.DATABASE_URL
 
 config.set_main_option('sqlalchemy.url', DATABASE_URL)
@@ -49,6 +61,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -72,7 +85,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,47 @@
+"""add loan due dates
+
+Revision ID: 2a70dbb16a6b
+Revises: e5cd84a1a1a9
+Create Date: 2026-10-18 04:27:44.198349
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a70dbb16a6b'
+down_revision: Union[str, None] = 'e5cd84a1a1a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Loans made before due dates were stored all ran for the old fixed 14 days.
+BACKFILL_DAYS = 14
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('loan_period_days', sa.Integer(), nullable=True))
+    op.add_column('borrowed_books', sa.Column('due_date', sa.DateTime(), nullable=True))
+
+    if op.get_bind().dialect.name == 'sqlite':
+        # datetime() drops the fractional seconds SQLAlchemy stores, so carry them over.
+        due_date = f"datetime(borrow_date, '+{BACKFILL_DAYS} days') || substr(borrow_date, 20)"
+    else:
+        due_date = f"borrow_date + interval '{BACKFILL_DAYS} days'"
+    op.execute(f"UPDATE borrowed_books SET due_date = {due_date} WHERE due_date IS NULL")
+
+    op.create_index(
+        'ix_borrowed_books_active_due_date', 'borrowed_books', ['due_date'],
+        unique=False,
+        postgresql_where=sa.text('return_date IS NULL'),
+        sqlite_where=sa.text('return_date IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_borrowed_books_active_due_date', table_name='borrowed_books')
+    op.drop_column('borrowed_books', 'due_date')
+    op.drop_column('books', 'loan_period_days')
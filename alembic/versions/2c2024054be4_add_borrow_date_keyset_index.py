@@ -0,0 +1,25 @@
+"""add borrow_date keyset index
+
+Revision ID: 2c2024054be4
+Revises: 07cc5bc6674c
+Create Date: 2026-10-18 04:06:24.091498
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c2024054be4'
+down_revision: Union[str, None] = '07cc5bc6674c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_borrowed_books_borrow_date_id', 'borrowed_books', ['borrow_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_borrowed_books_borrow_date_id', table_name='borrowed_books')
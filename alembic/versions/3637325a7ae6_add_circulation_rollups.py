@@ -0,0 +1,65 @@
+"""add circulation rollups
+
+Revision ID: 3637325a7ae6
+Revises: 2a70dbb16a6b
+Create Date: 2026-10-18 04:32:35.168509
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3637325a7ae6'
+down_revision: Union[str, None] = '2a70dbb16a6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_circulation',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('total_loans', sa.Integer(), nullable=False),
+        sa.Column('active_loans', sa.Integer(), nullable=False),
+        sa.Column('last_borrowed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id'),
+    )
+    op.create_index('ix_book_circulation_total_loans', 'book_circulation', ['total_loans', 'book_id'], unique=False)
+    op.create_index('ix_book_circulation_active_loans', 'book_circulation', ['active_loans', 'book_id'], unique=False)
+    op.create_table(
+        'daily_circulation',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('loans', sa.Integer(), nullable=False),
+        sa.Column('returns', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+
+    # Same as `python -m app.circulation rebuild`, in plain SQL so it doesn't track the models.
+    op.execute("""
+        INSERT INTO book_circulation (book_id, total_loans, active_loans, last_borrowed_at)
+        SELECT borrowed_books.book_id, count(*),
+               sum(CASE WHEN borrowed_books.return_date IS NULL THEN 1 ELSE 0 END),
+               max(borrowed_books.borrow_date)
+        FROM borrowed_books JOIN books ON books.id = borrowed_books.book_id
+        GROUP BY borrowed_books.book_id
+    """)
+    op.execute("""
+        INSERT INTO daily_circulation (day, loans, returns)
+        SELECT day, sum(loans), sum(returns) FROM (
+            SELECT date(borrow_date) AS day, 1 AS loans, 0 AS returns FROM borrowed_books
+            UNION ALL
+            SELECT date(return_date), 0, 1 FROM borrowed_books WHERE return_date IS NOT NULL
+        ) AS events
+        GROUP BY day
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('daily_circulation')
+    op.drop_index('ix_book_circulation_active_loans', table_name='book_circulation')
+    op.drop_index('ix_book_circulation_total_loans', table_name='book_circulation')
+    op.drop_table('book_circulation')
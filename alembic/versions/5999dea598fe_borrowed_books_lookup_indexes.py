@@ -0,0 +1,35 @@
+"""borrowed_books lookup indexes
+
+Revision ID: 5999dea598fe
+Revises: fff86b88ad3d
+Create Date: 2026-10-18 04:13:04.324838
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5999dea598fe'
+down_revision: Union[str, None] = 'fff86b88ad3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_borrowed_books_user_id_return_date', 'borrowed_books', ['user_id', 'return_date'], unique=False)
+    op.create_index('ix_borrowed_books_book_id_return_date', 'borrowed_books', ['book_id', 'return_date'], unique=False)
+    op.create_index(
+        'ix_borrowed_books_active_borrow_date', 'borrowed_books', ['borrow_date'],
+        unique=False,
+        postgresql_where=sa.text('return_date IS NULL'),
+        sqlite_where=sa.text('return_date IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_borrowed_books_active_borrow_date', table_name='borrowed_books')
+    op.drop_index('ix_borrowed_books_book_id_return_date', table_name='borrowed_books')
+    op.drop_index('ix_borrowed_books_user_id_return_date', table_name='borrowed_books')
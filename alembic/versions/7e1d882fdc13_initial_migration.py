@@ -18,13 +18,56 @@ branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
+# This revision was generated empty while the tables still came from
+# create_all at startup; it now creates the original schema so that
+# `alembic upgrade head` can build a database from scratch. Databases
+# created by create_all before that are already past it.
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('password', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_table('books',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('author', sa.String(), nullable=True),
+    sa.Column('published_date', sa.Date(), nullable=True),
+    sa.Column('isbn', sa.String(), nullable=True),
+    sa.Column('available_copies', sa.Integer(), nullable=True),
+    sa.Column('total_copies', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('isbn')
+    )
+    op.create_index('ix_books_id', 'books', ['id'], unique=False)
+    op.create_index('ix_books_title', 'books', ['title'], unique=False)
+    op.create_table('borrowed_books',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('book_id', sa.Integer(), nullable=True),
+    sa.Column('borrow_date', sa.DateTime(), nullable=True),
+    sa.Column('return_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id']),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_borrowed_books_id', 'borrowed_books', ['id'], unique=False)
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_index('ix_borrowed_books_id', table_name='borrowed_books')
+    op.drop_table('borrowed_books')
+    op.drop_index('ix_books_title', table_name='books')
+    op.drop_index('ix_books_id', table_name='books')
+    op.drop_table('books')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,66 @@
+"""add book holds
+
+Revision ID: a64849210d8d
+Revises: 3637325a7ae6
+Create Date: 2026-10-18 05:12:06.768695
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a64849210d8d'
+down_revision: Union[str, None] = '3637325a7ae6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_holds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('ready_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('closed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_book_holds_id', 'book_holds', ['id'], unique=False)
+    op.create_index(
+        'ix_book_holds_waiting_queue', 'book_holds', ['book_id', 'created_at', 'id'],
+        postgresql_where=sa.text("status = 'waiting'"),
+        sqlite_where=sa.text("status = 'waiting'"),
+    )
+    op.create_index(
+        'ix_book_holds_ready_at', 'book_holds', ['ready_at'],
+        postgresql_where=sa.text("status = 'ready'"),
+        sqlite_where=sa.text("status = 'ready'"),
+    )
+    op.create_index(
+        'ix_book_holds_ready_expires_at', 'book_holds', ['expires_at'],
+        postgresql_where=sa.text("status = 'ready'"),
+        sqlite_where=sa.text("status = 'ready'"),
+    )
+    op.create_index(
+        'uq_book_holds_open_hold', 'book_holds', ['user_id', 'book_id'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('waiting', 'ready')"),
+        sqlite_where=sa.text("status IN ('waiting', 'ready')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_book_holds_open_hold', table_name='book_holds')
+    op.drop_index('ix_book_holds_ready_expires_at', table_name='book_holds')
+    op.drop_index('ix_book_holds_ready_at', table_name='book_holds')
+    op.drop_index('ix_book_holds_waiting_queue', table_name='book_holds')
+    op.drop_index('ix_book_holds_id', table_name='book_holds')
+    op.drop_table('book_holds')
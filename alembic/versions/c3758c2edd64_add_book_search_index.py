@@ -0,0 +1,54 @@
+"""add book search index
+
+Revision ID: c3758c2edd64
+Revises: 2c2024054be4
+Create Date: 2026-10-18 04:07:58.194834
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3758c2edd64'
+down_revision: Union[str, None] = '2c2024054be4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_EXPRESSION = "lower(coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(isbn, ''))"
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_books_search_trgm ON books USING gin (({SEARCH_EXPRESSION}) gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(title, author, isbn, content='books', content_rowid='id')")
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+            "INSERT INTO books_fts(rowid, title, author, isbn) VALUES (new.id, new.title, new.author, new.isbn); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+            "INSERT INTO books_fts(books_fts, rowid, title, author, isbn) VALUES ('delete', old.id, old.title, old.author, old.isbn); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, isbn ON books BEGIN "
+            "INSERT INTO books_fts(books_fts, rowid, title, author, isbn) VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+            "INSERT INTO books_fts(rowid, title, author, isbn) VALUES (new.id, new.title, new.author, new.isbn); END"
+        )
+        op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_books_search_trgm")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS books_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ai")
+        op.execute("DROP TABLE IF EXISTS books_fts")
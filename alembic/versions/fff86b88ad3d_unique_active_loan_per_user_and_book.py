@@ -0,0 +1,54 @@
+"""unique active loan per user and book
+
+Revision ID: fff86b88ad3d
+Revises: c3758c2edd64
+Create Date: 2026-10-18 04:10:10.463107
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fff86b88ad3d'
+down_revision: Union[str, None] = 'c3758c2edd64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+OPEN_LOANS = (
+    "(SELECT count(*) FROM borrowed_books "
+    "WHERE borrowed_books.book_id = books.id AND borrowed_books.return_date IS NULL)"
+)
+
+
+def upgrade() -> None:
+    # Concurrent borrows could open the same loan twice. Keep the earliest open
+    # loan per user and book and close the others as of their own borrow date.
+    op.execute(
+        "UPDATE borrowed_books SET return_date = borrow_date "
+        "WHERE return_date IS NULL AND EXISTS ("
+        "SELECT 1 FROM borrowed_books AS earlier "
+        "WHERE earlier.user_id = borrowed_books.user_id AND earlier.book_id = borrowed_books.book_id "
+        "AND earlier.return_date IS NULL "
+        "AND (earlier.borrow_date < borrowed_books.borrow_date "
+        "OR (earlier.borrow_date = borrowed_books.borrow_date AND earlier.id < borrowed_books.id)))"
+    )
+    # Each duplicate took a copy too; count the shelf again from the loans left open.
+    op.execute(
+        f"UPDATE books SET available_copies = CASE WHEN total_copies > {OPEN_LOANS} "
+        f"THEN total_copies - {OPEN_LOANS} ELSE 0 END "
+        "WHERE total_copies IS NOT NULL"
+    )
+    op.create_index(
+        'uq_borrowed_books_active_loan', 'borrowed_books', ['user_id', 'book_id'],
+        unique=True,
+        postgresql_where=sa.text('return_date IS NULL'),
+        sqlite_where=sa.text('return_date IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_borrowed_books_active_loan', table_name='borrowed_books')
@@ -0,0 +1,192 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+}
+
+# (row number, parsed record, parse error)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+class BookImport:
+    """Validates and inserts uploaded book rows in chunked transactions.
+
+    Rows are collected into batches of ``batch_size``; each batch costs one
+    ISBN lookup, one multi-row INSERT and one commit. Bad rows are reported
+    and skipped instead of failing the whole upload.
+    """
+
+    def __init__(self, db: AsyncSession, batch_size: int, max_reported_errors: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_reported_errors = max_reported_errors
+        self.seen_isbns = set()
+        self.rows_total = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[schemas.BookImportError] = []
+
+    def result(self) -> schemas.BookImportResult:
+        return schemas.BookImportResult(
+            rows_total=self.rows_total,
+            imported=self.imported,
+            failed=self.failed,
+            errors=sorted(self.errors, key=lambda error: error.row),
+            errors_truncated=self.failed > len(self.errors),
+        )
+
+    def reject(self, row: int, isbn, messages: List[str]):
+        self.failed += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append(schemas.BookImportError(row=row, isbn=isbn, errors=messages))
+
+    async def run(self, records: AsyncIterator[Record]) -> schemas.BookImportResult:
+        batch = []
+        try:
+            async for row, record, parse_error in records:
+                self.rows_total += 1
+                if parse_error:
+                    self.reject(row, None, [parse_error])
+                    continue
+                try:
+                    book = schemas.BookCreate.model_validate(record)
+                except ValidationError as exc:
+                    self.reject(row, record.get("isbn"), [
+                        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                        for error in exc.errors()
+                    ])
+                    continue
+                if book.isbn in self.seen_isbns:
+                    self.reject(row, book.isbn, ["Duplicate ISBN earlier in this upload"])
+                    continue
+                self.seen_isbns.add(book.isbn)
+                batch.append((row, book))
+                if len(batch) >= self.batch_size:
+                    await self.flush(batch)
+                    batch = []
+        except UnicodeDecodeError:
+            # Earlier batches are committed already, so this is reported like a bad row
+            # rather than failing the request; nothing after the bad bytes is read.
+            self.rows_total += 1
+            self.reject(self.rows_total, None, ["Upload must be UTF-8; reading stopped at an invalid byte sequence"])
+        if batch:
+            await self.flush(batch)
+        return self.result()
+
+    async def flush(self, batch: List[Tuple[int, schemas.BookCreate]]):
+        existing = set((await self.db.scalars(
+            select(models.Book.isbn).filter(models.Book.isbn.in_([book.isbn for _, book in batch]))
+        )).all())
+
+        rows = []
+        for row, book in batch:
+            if book.isbn in existing:
+                self.reject(row, book.isbn, ["Book with this ISBN already exists"])
+            else:
+                rows.append((row, book))
+        if not rows:
+            return
+
+        try:
+            await self.db.execute(insert(models.Book), [self.values(book) for _, book in rows])
+            await self.db.commit()
+            self.imported += len(rows)
+        except IntegrityError:
+            # Someone inserted one of these ISBNs since the lookup; fall back to row by row.
+            await self.db.rollback()
+            for row, book in rows:
+                try:
+                    await self.db.execute(insert(models.Book), [self.values(book)])
+                    await self.db.commit()
+                    self.imported += 1
+                except IntegrityError:
+                    await self.db.rollback()
+                    self.reject(row, book.isbn, ["Book with this ISBN already exists"])
+
+    @staticmethod
+    def values(book: schemas.BookCreate) -> dict:
+        return {**book.model_dump(), "available_copies": book.total_copies}
+
+def decode_lines(data: bytes) -> Iterator[str]:
+    """The lines of ``data``; at bytes that aren't UTF-8, the complete lines before them, then the error."""
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        valid = data[:exc.start].rpartition(b"\n")[0]
+        if valid:
+            yield from decode_lines(valid)
+        raise
+    for line in text.split("\n"):
+        yield line.rstrip("\r")
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without buffering the whole body.
+
+    Decodes up to the last newline of what has arrived, which never splits a
+    UTF-8 sequence. Raises UnicodeDecodeError after the last good line.
+    """
+    pending = b""
+    started = False
+    async for chunk in chunks:
+        pending += chunk
+        complete, newline, pending = pending.rpartition(b"\n")
+        if newline:
+            if not started:
+                complete = complete.removeprefix(codecs.BOM_UTF8)
+                started = True
+            for line in decode_lines(complete):
+                yield line
+    if not started:
+        pending = pending.removeprefix(codecs.BOM_UTF8)
+    if pending.strip():
+        for line in decode_lines(pending):
+            yield line
+
+async def iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Record]:
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield row, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Expected a JSON object"
+            continue
+        yield row, record, None
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Record]:
+    """CSV with a header row; fields may be quoted but must not contain newlines."""
+    header = None
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        record = dict(zip(header, values))
+        yield row, {key: (value if value != "" else None) for key, value in record.items()}, None
+
+def iter_records(format: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    lines = iter_lines(chunks)
+    return iter_csv_records(lines) if format == "csv" else iter_ndjson_records(lines)
@@ -0,0 +1,110 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response, status
+
+from .serialization import dumps
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> None:
+        for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: dict
+    book_ids: frozenset
+
+    @classmethod
+    def build(cls, content: Any, book_ids, headers: Optional[dict] = None) -> "CachedResponse":
+        body = dumps(content)
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        return cls(body, etag, headers or {}, frozenset(book_ids))
+
+    def to_response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, **self.headers}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = {tag.strip() for tag in if_none_match.split(",")}
+            if self.etag in candidates or "*" in candidates:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+class CatalogCache:
+    """Rendered book and book-listing responses.
+
+    Every invalidation bumps ``version``; a reader that started before the bump
+    passes its stale version to ``store_*`` and the result is not cached.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.books = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.listings = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.version = 0
+
+    def store_book(self, book_id: int, entry: CachedResponse, version: int) -> None:
+        if version == self.version:
+            self.books.set(book_id, entry)
+
+    def store_listing(self, key: Hashable, entry: CachedResponse, version: int) -> None:
+        if version == self.version:
+            self.listings.set(key, entry)
+
+    def invalidate_book(self, book_id: int) -> None:
+        """A book's fields changed in place, e.g. its available copies."""
+        self.version += 1
+        self.books.invalidate(book_id)
+        self.listings.invalidate_where(lambda entry: book_id in entry.book_ids)
+
+    def invalidate_catalog(self, book_id: Optional[int] = None) -> None:
+        """Books were added, removed or edited in ways that can reorder listings."""
+        self.version += 1
+        if book_id is not None:
+            self.books.invalidate(book_id)
+        self.listings.clear()
+
+    def stats(self) -> dict:
+        return {"books": self.books.stats(), "listings": self.listings.stats()}
@@ -0,0 +1,123 @@
+"""Circulation rollups: per-book and per-day loan counters.
+
+The borrow and return endpoints call ``record_borrows``/``record_returns``
+inside their own transaction, so the counters always agree with
+``borrowed_books``. ``rebuild`` recomputes both tables from scratch:
+
+    python -m app.circulation rebuild
+"""
+import argparse
+import datetime
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+UPSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+def check_dialect(engine) -> None:
+    """Refuse to start on a database the rollup upserts can't run on, rather than fail every borrow."""
+    if engine.dialect.name not in UPSERTS:
+        raise RuntimeError(
+            f"Circulation rollups need INSERT ... ON CONFLICT, which the {engine.dialect.name} dialect "
+            f"does not provide; supported databases: {', '.join(sorted(UPSERTS))}"
+        )
+
+def _upsert(db: AsyncSession, model):
+    # check_dialect ran at startup.
+    return UPSERTS[db.get_bind().dialect.name](model)
+
+async def _count_day(db: AsyncSession, day: datetime.date, loans: int = 0, returns: int = 0):
+    stmt = _upsert(db, models.DailyCirculation).values(day=day, loans=loans, returns=returns)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.DailyCirculation.day],
+        set_={
+            "loans": models.DailyCirculation.loans + stmt.excluded.loans,
+            "returns": models.DailyCirculation.returns + stmt.excluded.returns,
+        },
+    ))
+
+async def record_borrows(db: AsyncSession, book_ids: Iterable[int], borrowed_at: datetime.datetime):
+    """Count new loans of ``book_ids``; call before committing the loans themselves."""
+    # Sorted, so concurrent transactions lock the counter rows in the same order.
+    counts = sorted(Counter(book_ids).items())
+    if not counts:
+        return
+    stmt = _upsert(db, models.BookCirculation).values([
+        {"book_id": book_id, "total_loans": count, "active_loans": count, "last_borrowed_at": borrowed_at}
+        for book_id, count in counts
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.BookCirculation.book_id],
+        set_={
+            "total_loans": models.BookCirculation.total_loans + stmt.excluded.total_loans,
+            "active_loans": models.BookCirculation.active_loans + stmt.excluded.active_loans,
+            "last_borrowed_at": stmt.excluded.last_borrowed_at,
+        },
+    ))
+    await _count_day(db, borrowed_at.date(), loans=sum(count for _, count in counts))
+
+async def record_returns(db: AsyncSession, book_ids: Iterable[int], returned_at: datetime.datetime):
+    """Count returned loans of ``book_ids``; call before committing the returns."""
+    counts = sorted(Counter(book_ids).items())
+    if not counts:
+        return
+    stmt = _upsert(db, models.BookCirculation).values([
+        {"book_id": book_id, "total_loans": 0, "active_loans": 0} for book_id, _ in counts
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.BookCirculation.book_id],
+        set_={"active_loans": models.BookCirculation.active_loans - case(
+            *((models.BookCirculation.book_id == book_id, count) for book_id, count in counts), else_=0
+        )},
+    ))
+    await _count_day(db, returned_at.date(), returns=sum(count for _, count in counts))
+
+def rebuild(connection) -> dict:
+    """Recompute both rollup tables from ``borrowed_books`` on a sync connection, in its transaction."""
+    loans = models.BorrowedBook
+    connection.execute(delete(models.BookCirculation))
+    connection.execute(delete(models.DailyCirculation))
+
+    connection.execute(insert(models.BookCirculation).from_select(
+        ["book_id", "total_loans", "active_loans", "last_borrowed_at"],
+        select(
+            loans.book_id,
+            func.count(),
+            func.sum(case((loans.return_date.is_(None), 1), else_=0)),
+            func.max(loans.borrow_date),
+        )
+        .join(models.Book, models.Book.id == loans.book_id)
+        .group_by(loans.book_id),
+    ))
+
+    events = union_all(
+        select(func.date(loans.borrow_date).label("day"), literal(1).label("loans"), literal(0).label("returns")),
+        select(func.date(loans.return_date), literal(0), literal(1)).filter(loans.return_date.is_not(None)),
+    ).subquery()
+    connection.execute(insert(models.DailyCirculation).from_select(
+        ["day", "loans", "returns"],
+        select(events.c.day, func.sum(events.c.loans), func.sum(events.c.returns)).group_by(events.c.day),
+    ))
+
+    return {
+        "books": connection.scalar(select(func.count()).select_from(models.BookCirculation)),
+        "days": connection.scalar(select(func.count()).select_from(models.DailyCirculation)),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the circulation rollup tables.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    from .database import engine
+
+    with engine.begin() as connection:
+        print(rebuild(connection))
@@ -1,18 +1,82 @@
 from pydantic_settings import BaseSettings
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "FastAPI"
     LOG_FILE: str = "app.log"
-    DATABASE_URL: str   
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 256
+    DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # "create_all" creates missing tables on every worker start; "alembic" leaves the
+    # schema to `alembic upgrade head` and only checks the database is at the head.
+    SCHEMA_MANAGEMENT: Literal["create_all", "alembic"] = "create_all"
+    # Connection pool, per engine: primary and each replica.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Reconnect connections older than this; -1 keeps them forever.
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Readiness results are shared between probes arriving within this window.
+    HEALTH_CHECK_CACHE_SECONDS: float = 1.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+
+    # Comma-separated read replicas for GET endpoints, in the same form as DATABASE_URL.
+    DATABASE_REPLICA_URLS: str = ""
+    # Reads stay on the primary for this long after a client's own writes.
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_RETRY_SECONDS: float = 30.0
+    REPLICA_CONNECT_TIMEOUT_SECONDS: float = 2.0
     SECRET_KEY: str = "your-secret-key"
     ALGORITHM: str 
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_WAITING: int = 32
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 2.0
+
+    # Login attempts allowed in a burst, then refilled per minute, per client IP and per username.
+    LOGIN_RATE_IP_BURST: int = 20
+    LOGIN_RATE_IP_PER_MINUTE: float = 10.0
+    LOGIN_RATE_USERNAME_BURST: int = 5
+    LOGIN_RATE_USERNAME_PER_MINUTE: float = 2.0
+    LOGIN_RATE_MAX_KEYS: int = 10000
+
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: float = 60.0
+
+    CATALOG_CACHE_SIZE: int = 1024
+    CATALOG_CACHE_TTL_SECONDS: float = 30.0
+
+    # Loan period for books without their own loan_period_days.
+    LOAN_PERIOD_DAYS: int = 14
+
+    # How long a copy returned to the next holder stays set aside for them.
+    HOLD_PICKUP_HOURS: float = 48.0
+    HOLD_WORKER_POLL_SECONDS: float = 5.0
+    HOLD_WORKER_BATCH_SIZE: int = 100
+    HOLD_EVENTS_KEEPALIVE_SECONDS: float = 15.0
+
+    BOOK_IMPORT_BATCH_SIZE: int = 1000
+    BOOK_IMPORT_MAX_REPORTED_ERRORS: int = 1000
+
     EMAIL_HOST: str = "smtp.gmail.com"
     EMAIL_PORT: int = 587
     EMAIL_USER: str = "your-email"
     EMAIL_PASSWORD: str  = "your-password"
     EMAIL_FROM: str = "your-email"
+    EMAIL_USE_TLS: bool = True
+    # "smtp" delivers through EMAIL_HOST; "console" only prints, for local development.
+    EMAIL_BACKEND: str = "console"
+
+    EMAIL_OUTBOX_BATCH_SIZE: int = 100
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5.0
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    EMAIL_OUTBOX_BACKOFF_SECONDS: float = 30.0
+    EMAIL_OUTBOX_MAX_BACKOFF_SECONDS: float = 3600.0
+    EMAIL_OUTBOX_LEASE_SECONDS: float = 300.0
 
     class Config:
         env_file = ".env"
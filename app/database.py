@@ -1,14 +1,115 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import logging
+import time
+from typing import List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from .config import settings
+from .metrics import DB_POOL_WAIT
+
+logger = logging.getLogger("app.database")
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0])
+    if driver is None:
+        return url
+    return f"{driver}{sep}{rest}"
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(DATABASE_URL)
+
+class TimedPoolMixin:
+    """Counts checkouts and the time spent waiting for them (including connecting)."""
+
+    # Log as sqlalchemy.pool, not as one of the app's own loggers.
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.QueuePool"
+    label = "primary"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            DB_POOL_WAIT.labels(self.label).observe(waited)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            # overflow() counts up from -pool_size, so it's only meaningful above zero.
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def pool_options(**overrides) -> dict:
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    options.update(overrides)
+    return options
+
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **pool_options())
+engine.pool.label = "primary_sync"
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **pool_options())
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -16,4 +117,142 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+class RequestWrites:
+    __slots__ = ("committed",)
+
+    def __init__(self):
+        self.committed = False
+
+# Set per request by the middleware; a commit on the primary marks the request as a writer.
+current_request_writes: contextvars.ContextVar[Optional[RequestWrites]] = contextvars.ContextVar(
+    "current_request_writes", default=None
+)
+
+def track_writes(engine):
+    @event.listens_for(engine, "commit")
+    def on_commit(conn):
+        writes = current_request_writes.get()
+        if writes is not None:
+            writes.committed = True
+
+track_writes(engine)
+track_writes(async_engine.sync_engine)
+
+# Set on responses to requests that wrote; while it is in the future, reads go to the primary.
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+class ReplicaSet:
+    """Read replicas, used in turn; one that can't be reached is skipped for ``retry_seconds``."""
+
+    def __init__(self, urls: List[str], retry_seconds: float, connect_timeout: float):
+        self.urls = urls
+        # pre-ping, so a replica that went away is noticed at checkout and not mid-query.
+        self.engines = [
+            create_async_engine(get_async_database_url(url), poolclass=TimedAsyncQueuePool, **pool_options(pool_pre_ping=True))
+            for url in urls
+        ]
+        for index, replica in enumerate(self.engines):
+            replica.pool.label = f"replica_{index}"
+        self.sessionmakers = [
+            async_sessionmaker(bind=replica, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            for replica in self.engines
+        ]
+        self.retry_seconds = retry_seconds
+        self.connect_timeout = connect_timeout
+        self.down_until = [0.0] * len(urls)
+        self.next = 0
+        self.replica_reads = 0
+        self.sticky_reads = 0
+        self.fallback_reads = 0
+        self.connect_failures = 0
+
+    async def session(self) -> Optional[AsyncSession]:
+        """A connected session on the next available replica, or None when none is reachable."""
+        for offset in range(len(self.engines)):
+            index = (self.next + offset) % len(self.engines)
+            if self.down_until[index] > time.monotonic():
+                continue
+            db = self.sessionmakers[index]()
+            try:
+                await asyncio.wait_for(db.connection(), self.connect_timeout)
+            except (DBAPIError, OSError, asyncio.TimeoutError) as exc:
+                await db.close()
+                self.down_until[index] = time.monotonic() + self.retry_seconds
+                self.connect_failures += 1
+                logger.warning(f"Read replica {index} unavailable, skipping it for {self.retry_seconds}s: {exc}")
+                continue
+            self.next = index + 1
+            return db
+        return None
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": len(self.engines),
+            "available": sum(down_until <= now for down_until in self.down_until),
+            "replica_reads": self.replica_reads,
+            "sticky_reads": self.sticky_reads,
+            "fallback_reads": self.fallback_reads,
+            "connect_failures": self.connect_failures,
+        }
+
+    async def dispose(self):
+        for replica in self.engines:
+            await replica.dispose()
+
+replicas = ReplicaSet(
+    [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()],
+    retry_seconds=settings.REPLICA_RETRY_SECONDS,
+    connect_timeout=settings.REPLICA_CONNECT_TIMEOUT_SECONDS,
+)
+
+def pool_stats() -> dict:
+    """Live state of the request pools: the primary's and each replica's."""
+    stats = {"primary": async_engine.pool.stats()}
+    for replica in replicas.engines:
+        stats[replica.pool.label] = replica.pool.stats()
+    return stats
+
+def reads_from_primary(request: Request) -> bool:
+    """Whether this client wrote recently enough that a replica may not have its changes yet."""
+    writes = current_request_writes.get()
+    if writes is not None and writes.committed:
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def open_replica_session(request: Request) -> Optional[AsyncSession]:
+    """A session on a reachable replica, or None when this request should read the primary."""
+    if replicas.engines:
+        if reads_from_primary(request):
+            replicas.sticky_reads += 1
+        else:
+            db = await replicas.session()
+            if db is not None:
+                replicas.replica_reads += 1
+                return db
+            replicas.fallback_reads += 1
+    return None
+
+async def open_read_session(request: Request) -> AsyncSession:
+    """A session for read-only work: a replica when one is configured and reachable, else the primary."""
+    db = await open_replica_session(request)
+    return db if db is not None else AsyncSessionLocal()
+
+async def get_read_db(request: Request, primary: AsyncSession = Depends(get_async_db)):
+    # Reads on the primary share the request's session, e.g. the one that authenticated
+    # it, so a request never holds two connections from the primary pool.
+    db = await open_replica_session(request)
+    if db is None:
+        yield primary
+        return
+    async with db:
+        yield db
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from .config import settings
+from .database import ASYNC_DATABASE_URL
+
+class ReadinessProbe:
+    """Checks the database over a fresh connection of its own, outside the request pool.
+
+    Probes arriving within ``cache_seconds`` of a check share its result, and
+    concurrent probes wait for one check instead of each running their own,
+    so at most one connection per window is opened however often they come.
+    """
+
+    def __init__(self, url: str, cache_seconds: float, timeout: float):
+        self.engine = create_async_engine(url, poolclass=NullPool)
+        self.cache_seconds = cache_seconds
+        self.timeout = timeout
+        self.lock = asyncio.Lock()
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checks = 0
+        self.failures = 0
+
+    def _fresh(self) -> bool:
+        return self.checked_at is not None and time.monotonic() - self.checked_at < self.cache_seconds
+
+    async def _ping(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def check(self) -> Tuple[bool, Optional[str]]:
+        """``(ready, error)``; the error is None when the database answered."""
+        if not self._fresh():
+            async with self.lock:
+                if not self._fresh():
+                    self.checks += 1
+                    try:
+                        await asyncio.wait_for(self._ping(), self.timeout)
+                        self.error = None
+                    except Exception as exc:
+                        self.failures += 1
+                        self.error = str(exc) or type(exc).__name__
+                    self.checked_at = time.monotonic()
+        return self.error is None, self.error
+
+    def stats(self) -> dict:
+        return {"checks": self.checks, "failures": self.failures, "ready": self.error is None}
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+readiness_probe = ReadinessProbe(
+    ASYNC_DATABASE_URL,
+    cache_seconds=settings.HEALTH_CHECK_CACHE_SECONDS,
+    timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+)
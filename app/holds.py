@@ -0,0 +1,298 @@
+"""Per-book hold queues.
+
+A reader who finds no copy left places a hold. When a copy comes back it is
+set aside for the oldest waiting hold instead of going back on the shelf;
+the hold turns ``ready`` and its reader has ``HOLD_PICKUP_HOURS`` to borrow
+it before the copy moves on to the next hold. All of this is in the
+``book_holds`` table, so queues survive restarts; ``hold_notifier`` only
+pushes the ``ready`` transitions to readers listening on ``/holds/events``.
+"""
+import asyncio
+import datetime
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+
+from . import models, schemas
+from .config import settings
+from .database import AsyncSessionLocal
+from .utils import utcnow
+
+logger = logging.getLogger("app.holds")
+
+WAITING = "waiting"
+READY = "ready"
+FULFILLED = "fulfilled"
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+OPEN = (WAITING, READY)
+
+def hold_out(hold: models.BookHold, queue_position: Optional[int] = None) -> schemas.BookHoldOut:
+    out = schemas.BookHoldOut.model_validate(hold, from_attributes=True)
+    out.queue_position = queue_position
+    return out
+
+def hold_event(hold: models.BookHold) -> dict:
+    return hold_out(hold).model_dump(mode="json")
+
+async def reserve_next(db, book_id: int, now: datetime.datetime) -> Optional[models.BookHold]:
+    """Set a copy of ``book_id`` aside for its oldest waiting hold, if there is one."""
+    oldest = (
+        select(models.BookHold.id)
+        .where(models.BookHold.book_id == book_id, models.BookHold.status == WAITING)
+        .order_by(models.BookHold.created_at, models.BookHold.id)
+        .limit(1)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        oldest = oldest.with_for_update(skip_locked=True)
+    return await db.scalar(
+        update(models.BookHold)
+        .where(models.BookHold.id == oldest.scalar_subquery(), models.BookHold.status == WAITING)
+        .values(
+            status=READY,
+            ready_at=now,
+            expires_at=now + datetime.timedelta(hours=settings.HOLD_PICKUP_HOURS),
+        )
+        .returning(models.BookHold)
+        .execution_options(synchronize_session=False)
+    )
+
+async def release_copies(db, book_ids: Iterable[int], now: datetime.datetime) -> List[models.BookHold]:
+    """Hand one copy of each book to its next holder, or back to the shelf when nobody waits.
+
+    ``book_ids`` may repeat a book for several copies. Returns the holds made ready.
+    """
+    ready = []
+    shelved = defaultdict(int)
+    for book_id in book_ids:
+        hold = await reserve_next(db, book_id, now)
+        if hold is None:
+            shelved[book_id] += 1
+        else:
+            ready.append(hold)
+    # One UPDATE per distinct number of copies, so a batch return still shelves with one.
+    for copies in set(shelved.values()):
+        await db.execute(
+            update(models.Book)
+            .where(models.Book.id.in_([book_id for book_id, n in shelved.items() if n == copies]))
+            .values(available_copies=models.Book.available_copies + copies)
+        )
+    return ready
+
+async def fulfil(db, user_id: int, book_ids: List[int], now: datetime.datetime) -> Dict[int, bool]:
+    """Close the reader's open holds on ``book_ids`` because they are borrowing them.
+
+    Maps each book with an open hold to whether a copy was already set aside
+    for it; those loans must not claim another copy.
+    """
+    closed = await db.execute(
+        update(models.BookHold)
+        .where(
+            models.BookHold.user_id == user_id,
+            models.BookHold.book_id.in_(book_ids),
+            models.BookHold.status.in_(OPEN),
+        )
+        .values(status=FULFILLED, closed_at=now)
+        # ready_at is only ever set on the way to ready, so it tells the two open states apart.
+        .returning(models.BookHold.book_id, models.BookHold.ready_at)
+        .execution_options(synchronize_session=False)
+    )
+    return {book_id: ready_at is not None for book_id, ready_at in closed}
+
+async def reopen(db, user_id: int, book_ids: List[int], now: datetime.datetime) -> None:
+    """Undo ``fulfil`` at ``now`` for waiting holds whose loan didn't happen; they keep their place."""
+    await db.execute(
+        update(models.BookHold)
+        .where(
+            models.BookHold.user_id == user_id,
+            models.BookHold.book_id.in_(book_ids),
+            models.BookHold.status == FULFILLED,
+            models.BookHold.ready_at.is_(None),
+            models.BookHold.closed_at == now,
+        )
+        .values(status=WAITING, closed_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+def queue_position():
+    """Correlated count of the waiting holds ahead of ``BookHold``, for use in a select."""
+    ahead = aliased(models.BookHold)
+    return (
+        select(func.count(ahead.id))
+        .where(
+            ahead.book_id == models.BookHold.book_id,
+            ahead.status == WAITING,
+            (ahead.created_at < models.BookHold.created_at)
+            | ((ahead.created_at == models.BookHold.created_at) & (ahead.id < models.BookHold.id)),
+        )
+        .correlate(models.BookHold)
+        .scalar_subquery()
+    )
+
+class HoldNotifier:
+    """Fans hold events out to the ``/holds/events`` streams open in this process."""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self.published_total = 0
+        self.dropped_total = 0
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def listening(self) -> bool:
+        return bool(self._subscribers)
+
+    def wants(self, user_id: int) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, events: Iterable[dict]) -> None:
+        for event in events:
+            for queue in self._subscribers.get(event["user_id"], ()):
+                try:
+                    queue.put_nowait(event)
+                    self.published_total += 1
+                except asyncio.QueueFull:
+                    # The stream starts from the current ready holds on reconnect.
+                    self.dropped_total += 1
+
+    def stats(self) -> dict:
+        return {
+            "listening_users": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "published_total": self.published_total,
+            "dropped_total": self.dropped_total,
+        }
+
+hold_notifier = HoldNotifier()
+
+class HoldWorker:
+    """Background upkeep of the hold queues.
+
+    Each pass expires reservations nobody picked up and passes their copies
+    on, sets aside shelf copies for holds still waiting (a copy can reach the
+    shelf when total_copies grows, or when a return races a new hold), and
+    publishes holds that turned ready since the last pass, wherever they did,
+    to the streams of this process. Returns in this process publish straight
+    away; the pass covers the other workers.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, notifier: HoldNotifier = hold_notifier,
+                 poll_interval: float = 5.0, batch_size: int = 100,
+                 invalidate_book: Optional[Callable[[int], None]] = None):
+        self.session_factory = session_factory
+        self.notifier = notifier
+        # Called for books whose available copies a pass changed.
+        self.invalidate_book = invalidate_book
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._published_since: Optional[datetime.datetime] = None
+        self.runs_total = 0
+        self.expired_total = 0
+        self.promoted_total = 0
+
+    def start(self) -> None:
+        self._published_since = utcnow()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Hold queue upkeep failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run_once(self) -> List[models.BookHold]:
+        """One upkeep pass. Returns the holds it made ready."""
+        now = utcnow()
+        async with self.session_factory() as db:
+            expired = (await db.scalars(
+                update(models.BookHold)
+                .where(
+                    models.BookHold.id.in_(
+                        select(models.BookHold.id)
+                        .where(models.BookHold.status == READY, models.BookHold.expires_at < now)
+                        .limit(self.batch_size)
+                        .scalar_subquery()
+                    ),
+                    models.BookHold.status == READY,
+                )
+                .values(status=EXPIRED, closed_at=now)
+                .returning(models.BookHold.book_id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            ready = await release_copies(db, expired, now)
+
+            stranded = (await db.scalars(
+                select(models.BookHold.book_id)
+                .join(models.Book, models.Book.id == models.BookHold.book_id)
+                .where(models.BookHold.status == WAITING, models.Book.available_copies > 0)
+                .distinct()
+                .limit(self.batch_size)
+            )).all()
+            for book_id in stranded:
+                claimed = await db.scalar(
+                    update(models.Book)
+                    .where(models.Book.id == book_id, models.Book.available_copies > 0)
+                    .values(available_copies=models.Book.available_copies - 1)
+                    .returning(models.Book.id)
+                )
+                if claimed is not None:
+                    promoted = await release_copies(db, [book_id], now)
+                    self.promoted_total += len(promoted)
+                    ready.extend(promoted)
+            await db.commit()
+            self.expired_total += len(expired)
+            if self.invalidate_book is not None:
+                for book_id in set(expired) | set(stranded):
+                    self.invalidate_book(book_id)
+
+            if self.notifier.listening():
+                # Overlaps the previous pass a little; streams drop events they already sent.
+                since = self._published_since - datetime.timedelta(seconds=self.poll_interval)
+                recent = (await db.scalars(
+                    select(models.BookHold)
+                    .where(models.BookHold.status == READY, models.BookHold.ready_at >= since)
+                    .order_by(models.BookHold.ready_at)
+                )).all()
+                self.notifier.publish(hold_event(hold) for hold in recent if self.notifier.wants(hold.user_id))
+            self._published_since = now
+        self.runs_total += 1
+        return ready
+
+    def stats(self) -> dict:
+        return {
+            "runs_total": self.runs_total,
+            "expired_total": self.expired_total,
+            "promoted_total": self.promoted_total,
+        }
+
+hold_worker = HoldWorker(
+    poll_interval=settings.HOLD_WORKER_POLL_SECONDS,
+    batch_size=settings.HOLD_WORKER_BATCH_SIZE,
+)
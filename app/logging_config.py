@@ -0,0 +1,145 @@
+import copy
+import datetime
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler
+from typing import List
+
+# Attributes passed through ``extra=`` that end up as top-level JSON keys.
+STRUCTURED_FIELDS = (
+    "request_id", "method", "path", "user", "status_code", "duration_ms", "db_statements", "db_ms",
+)
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to a bounded queue and drops them, counted, when it is full."""
+
+    _exception_formatter = logging.Formatter()
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped_total = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # QueueHandler.prepare folds the traceback into msg, which would bury it
+        # in "message". Merge only the args here and keep the traceback, as
+        # text, in exc_text for JsonFormatter; the frames themselves aren't queued.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_total += 1
+
+class BatchingQueueListener:
+    """Drains the log queue on a background thread and writes records in batches.
+
+    Each batch is formatted up front and written to every handler's stream with
+    a single write and flush, so disk stalls never reach the event loop.
+    """
+
+    _sentinel = None
+
+    def __init__(self, log_queue: queue.Queue, handlers: List[logging.StreamHandler], batch_size: int):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self.queue.put(self._sentinel)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            stopping = record is self._sentinel
+            batch = [] if stopping else [record]
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    batch.append(record)
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: List[logging.LogRecord]):
+        for handler in self.handlers:
+            lines = [handler.format(record) + handler.terminator for record in batch if record.levelno >= handler.level]
+            if not lines:
+                continue
+            with handler.lock:
+                try:
+                    handler.stream.write("".join(lines))
+                    handler.flush()
+                except Exception:
+                    handler.handleError(batch[-1])
+
+def configure_logging(log_file: str, queue_size: int, batch_size: int):
+    """Route the root logger through a bounded queue to JSON file and console output."""
+    log_queue = queue.Queue(maxsize=queue_size)
+    formatter = JsonFormatter()
+
+    file_handler = logging.FileHandler(log_file)
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+
+    listener = BatchingQueueListener(log_queue, [file_handler, console_handler], batch_size=batch_size)
+    listener.start()
+    return queue_handler, listener
+
+def log_queue_stats() -> dict:
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            return {
+                "queued": handler.queue.qsize(),
+                "capacity": handler.queue.maxsize,
+                "dropped_total": handler.dropped_total,
+            }
+    return {}
@@ -1,12 +1,23 @@
-from fastapi import FastAPI, Request, status, HTTPException, Depends
+from fastapi import FastAPI, Request, status, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+import time
+import uuid
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 from .config import settings
-from .routers import auth, books, borrow, admin
-from .database import Base, get_db, engine
+from .routers import auth, books, borrow, holds, admin
+from .database import (
+    READ_PRIMARY_COOKIE, Base, RequestWrites, async_engine, current_request_writes, engine, pool_stats, replicas,
+)
+from .health import readiness_probe
+from .migrations import check_schema_head
+from .logging_config import configure_logging, log_queue_stats
+from .outbox import outbox_worker
+from .holds import hold_notifier, hold_worker
+from .metrics import RequestDbStats, StatsCollector, current_db_stats, instrument_engine, observe_request
+from . import circulation, utils
+from .pagination import NEXT_CURSOR_HEADER
 from jose import JWTError, jwt
 
 app = FastAPI(
@@ -14,20 +25,41 @@ app = FastAPI(
 )
 
 
-logging.basicConfig(
-    filename=settings.LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-    datefmt="%d-%Y-%m %H:%M:%S",
+log_queue_handler, log_listener = configure_logging(
+    settings.LOG_FILE,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    batch_size=settings.LOG_BATCH_SIZE,
 )
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s - %(message)s")
-console_handler.setFormatter(formatter)
-logging.getLogger().addHandler(console_handler)
+request_logger = logging.getLogger("app.requests")
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+REGISTRY.register(StatsCollector({
+    "password_pool": utils.password_pool.stats,
+    "user_cache": auth.user_cache.stats,
+    "login_limiter": auth.login_limiter_stats,
+    "catalog_cache": books.catalog_cache.stats,
+    "log_queue": log_queue_stats,
+    "email_outbox": outbox_worker.stats,
+    "hold_worker": hold_worker.stats,
+    "hold_events": hold_notifier.stats,
+    "read_replicas": replicas.stats,
+    "db_pool": pool_stats,
+    "readiness": readiness_probe.stats,
+}))
+# Expired reservations and promotions change available copies outside any request.
+hold_worker.invalidate_book = books.catalog_cache.invalidate_book
+for replica in replicas.engines:
+    instrument_engine(replica.sync_engine)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
+    start = time.perf_counter()
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    db_stats = RequestDbStats()
+    current_db_stats.set(db_stats)
+    writes = RequestWrites()
+    current_request_writes.set(writes)
     path = request.url.path
     method = request.method
     user = "anonymous"
@@ -36,16 +68,48 @@ async def log_requests(request: Request, call_next):
     if auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
             user = payload.get("sub", "unknown")  
         except JWTError:
+            payload = None
             user = "invalid_token"
+        # Reused by get_current_user so the token is only verified once per request.
+        request.state.token = token
+        request.state.token_payload = payload
 
-    log_message = f"Path: {path}, Method: {method}, User: {user}"
-    logging.info(log_message)
-
-    response = await call_next(request)
-    return response
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    response_size = None
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        content_length = response.headers.get("content-length")
+        response_size = int(content_length) if content_length else None
+        response.headers["X-Request-ID"] = request_id
+        if writes.committed and replicas.engines:
+            sticky_seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                READ_PRIMARY_COOKIE, str(time.time() + sticky_seconds),
+                max_age=int(sticky_seconds) + 1, httponly=True, samesite="lax"
+            )
+        return response
+    finally:
+        duration = time.perf_counter() - start
+        matched_route = request.scope.get("route")
+        route = matched_route.path if matched_route else "unmatched"
+        observe_request(method, route, status_code, duration, response_size, db_stats)
+        request_logger.info(
+            f"{method} {path} {status_code}",
+            extra={
+                "request_id": request_id,
+                "method": method,
+                "path": path,
+                "user": user,
+                "status_code": status_code,
+                "duration_ms": round(duration * 1000, 2),
+                "db_statements": db_stats.statements,
+                "db_ms": round(db_stats.seconds * 1000, 2),
+            },
+        )
 
 app.add_middleware(
     CORSMiddleware,
@@ -53,6 +117,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "X-Request-ID"],
 )
 
 # logger = logging.getLogger(__name__)
@@ -77,26 +142,62 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
             "message": exc.detail,
             "path": request.url.path,
         },
+        headers=exc.headers,
     )
 
 app.include_router(auth.router)
 app.include_router(books.router)
 app.include_router(borrow.router) 
+app.include_router(holds.router)
 app.include_router(admin.router) 
 
 @app.on_event("startup")
 async def startup_event():
-    Base.metadata.create_all(bind=engine)
+    circulation.check_dialect(async_engine)
+    if settings.SCHEMA_MANAGEMENT == "alembic":
+        await check_schema_head(async_engine)
+    else:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    outbox_worker.start()
+    hold_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await outbox_worker.stop()
+    await hold_worker.stop()
+    await async_engine.dispose()
+    await replicas.dispose()
+    await readiness_probe.dispose()
+    log_listener.stop()
 
 @app.get("/")
 async def root():
     return {"message": "Running..."}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/health/live")
+async def liveness():
+    # Process is up and serving; deliberately no database round trip.
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    ready, error = await readiness_probe.check()
+    if not ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "detail": error},
+        )
+    return {"status": "ready"}
+
 @app.get("/database-health")
-async def database_health(db: Session = Depends(get_db)):
-    try:
-        db.execute(text("SELECT 1"))
-        return {"message": "Database is healthy"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def database_health():
+    ready, error = await readiness_probe.check()
+    if not ready:
+        raise HTTPException(status_code=500, detail=error)
+    return {"message": "Database is healthy"}
     
@@ -0,0 +1,87 @@
+import contextvars
+import time
+from typing import Callable, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled.", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request.", ["method", "route"]
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size, when known up front.", ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request.", ["method", "route"]
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection, connecting included.", ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+class RequestDbStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+# Set per request by the middleware; engine event hooks add to whatever is current.
+current_db_stats: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar(
+    "current_db_stats", default=None
+)
+
+def instrument_engine(engine):
+    """Count statements and time spent in them for the request that issued them."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_db_stats.get()
+        if stats is None:
+            return
+        stats.statements += 1
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            stats.seconds += time.perf_counter() - started
+
+def observe_request(method: str, route: str, status_code: int, duration: float,
+                    response_size: Optional[int], db_stats: RequestDbStats):
+    REQUESTS.labels(method, route, str(status_code)).inc()
+    REQUEST_LATENCY.labels(method, route).observe(duration)
+    if response_size is not None:
+        RESPONSE_SIZE.labels(method, route).observe(response_size)
+    DB_STATEMENTS.labels(method, route).observe(db_stats.statements)
+    DB_TIME.labels(method, route).observe(db_stats.seconds)
+
+class StatsCollector:
+    """Publishes the ``stats()`` dicts of in-process pools, caches and queues as gauges."""
+
+    def __init__(self, sources: Dict[str, Callable[[], dict]]):
+        self.sources = sources
+
+    def collect(self):
+        for prefix, source in self.sources.items():
+            for name, value in self._flatten(f"app_{prefix}", source()):
+                yield GaugeMetricFamily(name, f"{name.replace('_', ' ')}", value=value)
+
+    def _flatten(self, prefix: str, stats: dict):
+        for key, value in stats.items():
+            name = f"{prefix}_{key}"
+            if isinstance(value, dict):
+                yield from self._flatten(name, value)
+            elif isinstance(value, (int, float)):
+                yield name, float(value)
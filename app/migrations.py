@@ -0,0 +1,38 @@
+"""Startup check for databases whose schema is managed by Alembic alone.
+
+With ``SCHEMA_MANAGEMENT=alembic`` workers never create or reflect tables;
+they only compare the database's ``alembic_version`` with the migration
+head, once at startup, and refuse to serve a schema that is behind or
+ahead of the code. Alembic is imported here lazily, so the default
+``create_all`` mode doesn't pay for it.
+"""
+import os
+from typing import Set
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+def migration_heads() -> Set[str]:
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+def database_heads(connection) -> Set[str]:
+    from alembic.runtime.migration import MigrationContext
+
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+async def check_schema_head(async_engine):
+    expected = migration_heads()
+    async with async_engine.connect() as conn:
+        current = await conn.run_sync(database_heads)
+    if current != expected:
+        raise SchemaOutOfDate(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, "
+            f"migrations head is {', '.join(sorted(expected))}; run `alembic upgrade head`"
+        )
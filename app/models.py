@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime, Date, Index, DDL, event
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -23,9 +23,35 @@ class Book(Base):
     isbn = Column(String, unique=True)
     available_copies = Column(Integer)
     total_copies = Column(Integer)
+    loan_period_days = Column(Integer, nullable=True)
 
     borrowed_records = relationship("BorrowedBook", back_populates="book")
 
+# Search index over title, author and ISBN: trigram GIN on Postgres, FTS5 on SQLite.
+# The Alembic migration builds the same objects for existing databases, and
+# include_object in alembic/env.py keeps autogenerate from dropping them.
+BOOK_SEARCH_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_books_search_trgm ON books USING gin "
+        "((lower(coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(isbn, ''))) gin_trgm_ops)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(title, author, isbn, content='books', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+        "INSERT INTO books_fts(rowid, title, author, isbn) VALUES (new.id, new.title, new.author, new.isbn); END",
+        "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, isbn) VALUES ('delete', old.id, old.title, old.author, old.isbn); END",
+        "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, isbn ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, isbn) VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+        "INSERT INTO books_fts(rowid, title, author, isbn) VALUES (new.id, new.title, new.author, new.isbn); END",
+    ],
+}
+
+for dialect, statements in BOOK_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+
 class BorrowedBook(Base):
     __tablename__ = "borrowed_books"
     id = Column(Integer, primary_key=True, index=True)
@@ -33,6 +59,104 @@ class BorrowedBook(Base):
     book_id = Column(Integer, ForeignKey("books.id"))
     borrow_date = Column(DateTime)
     return_date = Column(DateTime, nullable=True)
+    due_date = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="borrowed_books")
-    book = relationship("Book", back_populates="borrowed_records")
\ No newline at end of file
+    book = relationship("Book", back_populates="borrowed_records")
+
+    __table_args__ = (
+        Index("ix_borrowed_books_borrow_date_id", "borrow_date", "id"),
+        Index("ix_borrowed_books_user_id_return_date", "user_id", "return_date"),
+        Index("ix_borrowed_books_book_id_return_date", "book_id", "return_date"),
+        Index(
+            "ix_borrowed_books_active_borrow_date", "borrow_date",
+            postgresql_where=return_date.is_(None),
+            sqlite_where=return_date.is_(None),
+        ),
+        Index(
+            "ix_borrowed_books_active_due_date", "due_date",
+            postgresql_where=return_date.is_(None),
+            sqlite_where=return_date.is_(None),
+        ),
+        Index(
+            "uq_borrowed_books_active_loan", "user_id", "book_id",
+            unique=True,
+            postgresql_where=return_date.is_(None),
+            sqlite_where=return_date.is_(None),
+        ),
+    )
+
+class BookHold(Base):
+    """A reader's place in the FIFO queue for a book, and the copy set aside once one comes back."""
+    __tablename__ = "book_holds"
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # waiting -> ready -> fulfilled, or cancelled / expired
+    status = Column(String, nullable=False, default="waiting")
+    created_at = Column(DateTime, nullable=False)
+    ready_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    closed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_book_holds_waiting_queue", "book_id", "created_at", "id",
+            postgresql_where=status == "waiting",
+            sqlite_where=status == "waiting",
+        ),
+        Index(
+            "ix_book_holds_ready_at", "ready_at",
+            postgresql_where=status == "ready",
+            sqlite_where=status == "ready",
+        ),
+        Index(
+            "ix_book_holds_ready_expires_at", "expires_at",
+            postgresql_where=status == "ready",
+            sqlite_where=status == "ready",
+        ),
+        Index(
+            "uq_book_holds_open_hold", "user_id", "book_id",
+            unique=True,
+            postgresql_where=status.in_(["waiting", "ready"]),
+            sqlite_where=status.in_(["waiting", "ready"]),
+        ),
+    )
+
+class BookCirculation(Base):
+    """Per-book loan counters, kept current by the borrow and return transactions."""
+    __tablename__ = "book_circulation"
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    total_loans = Column(Integer, nullable=False, default=0)
+    active_loans = Column(Integer, nullable=False, default=0)
+    last_borrowed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_book_circulation_total_loans", "total_loans", "book_id"),
+        Index("ix_book_circulation_active_loans", "active_loans", "book_id"),
+    )
+
+class DailyCirculation(Base):
+    """Loans and returns per UTC day."""
+    __tablename__ = "daily_circulation"
+    day = Column(Date, primary_key=True)
+    loans = Column(Integer, nullable=False, default=0)
+    returns = Column(Integer, nullable=False, default=0)
+
+class EmailOutbox(Base):
+    """Outgoing mail, written in the same transaction as the change that caused it."""
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
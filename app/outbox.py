@@ -0,0 +1,288 @@
+import asyncio
+import datetime
+import logging
+import random
+import smtplib
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional
+
+from sqlalchemy import func, select, update
+
+from . import models
+from .config import settings
+from .database import AsyncSessionLocal
+from .utils import utcnow
+
+logger = logging.getLogger("app.email")
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+def confirmation_email(email: str, username: str) -> models.EmailOutbox:
+    """Outbox row for the registration mail; add it to the session that creates the user."""
+    now = utcnow()
+    return models.EmailOutbox(
+        recipient=email,
+        subject="Welcome to our platform!",
+        body=f"Hello {username},\n\nThank you for registering!  Please confirm your email by clicking on this link: [link to confirmation page].",  # Replace confirmation link
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+
+class PermanentDeliveryError(Exception):
+    """The server rejected this message with a 5xx; retrying will not help."""
+
+class TransportUnavailable(Exception):
+    """The connection could not be opened or was lost; nothing more can be sent on it."""
+
+class SMTPTransport:
+    """One SMTP connection, opened on first use and reused for every message in a batch."""
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str],
+                 use_tls: bool = True, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        try:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except OSError as exc:  # smtplib.SMTPException is an OSError too
+            raise TransportUnavailable(f"{self.host}:{self.port}: {exc}") from exc
+        return server
+
+    def send(self, sender: str, recipient: str, subject: str, body: str) -> None:
+        if self._server is None:
+            self._server = self._connect()
+        message = MIMEText(body)
+        message["Subject"] = subject
+        message["From"] = sender
+        message["To"] = recipient
+        try:
+            self._server.sendmail(sender, [recipient], message.as_string())
+        except smtplib.SMTPRecipientsRefused as exc:
+            if all(code >= 500 for code, _ in exc.recipients.values()):
+                raise PermanentDeliveryError(str(exc.recipients)) from exc
+            raise
+        except smtplib.SMTPResponseException as exc:
+            if exc.smtp_code >= 500:
+                raise PermanentDeliveryError(f"{exc.smtp_code} {exc.smtp_error!r}") from exc
+            raise
+        except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as exc:
+            self._server = None
+            raise TransportUnavailable(str(exc)) from exc
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except OSError:
+            self._server.close()
+        self._server = None
+
+class ConsoleTransport:
+    """Prints instead of sending; the default outside production."""
+
+    def send(self, sender: str, recipient: str, subject: str, body: str) -> None:
+        print(f"Sending email to {recipient}: {subject}")
+
+    def close(self) -> None:
+        pass
+
+def make_transport():
+    if settings.EMAIL_BACKEND == "smtp":
+        return SMTPTransport(
+            settings.EMAIL_HOST,
+            settings.EMAIL_PORT,
+            settings.EMAIL_USER,
+            settings.EMAIL_PASSWORD,
+            use_tls=settings.EMAIL_USE_TLS,
+        )
+    return ConsoleTransport()
+
+class OutboxWorker:
+    """Delivers ``email_outbox`` rows in batches over a single transport connection.
+
+    A batch is claimed by pushing its ``next_attempt_at`` one lease into the
+    future, so concurrent workers never pick the same rows and a worker that
+    dies mid-batch only delays them until the lease runs out. Delivery is
+    therefore at-least-once. Transient failures back off exponentially with
+    jitter; after ``max_attempts`` or a permanent rejection a row is marked
+    ``failed`` and left for inspection.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, transport_factory: Callable = make_transport,
+                 batch_size: int = 100, poll_interval: float = 5.0, max_attempts: int = 8,
+                 backoff: float = 30.0, max_backoff: float = 3600.0, lease: float = 300.0):
+        self.session_factory = session_factory
+        self.transport_factory = transport_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.batches_total = 0
+        self.sent_total = 0
+        self.retried_total = 0
+        self.failed_total = 0
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        """Wake the worker early, e.g. right after a request enqueued mail."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_batch()
+            except Exception:
+                logger.exception("Email outbox batch failed")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_batch(self) -> int:
+        """Claim, send and record one batch. Returns how many rows were claimed."""
+        messages = await self._claim()
+        if not messages:
+            return 0
+        outcomes = await asyncio.to_thread(self._deliver, messages)
+        await self._record(messages, outcomes)
+        self.batches_total += 1
+        return len(messages)
+
+    async def _claim(self) -> List[models.EmailOutbox]:
+        now = utcnow()
+        async with self.session_factory() as db:
+            due = (
+                select(models.EmailOutbox.id)
+                .where(models.EmailOutbox.status == PENDING, models.EmailOutbox.next_attempt_at <= now)
+                .order_by(models.EmailOutbox.next_attempt_at, models.EmailOutbox.id)
+                .limit(self.batch_size)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                due = due.with_for_update(skip_locked=True)
+            claimed = (await db.scalars(
+                update(models.EmailOutbox)
+                .where(
+                    models.EmailOutbox.id.in_(due.scalar_subquery()),
+                    models.EmailOutbox.status == PENDING,
+                    models.EmailOutbox.next_attempt_at <= now,
+                )
+                .values(
+                    attempts=models.EmailOutbox.attempts + 1,
+                    next_attempt_at=now + datetime.timedelta(seconds=self.lease),
+                )
+                .returning(models.EmailOutbox)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+        return claimed
+
+    def _deliver(self, messages: List[models.EmailOutbox]) -> dict:
+        """Runs on a worker thread; maps message id to ``(status, error)``."""
+        outcomes = {}
+        transport = self.transport_factory()
+        try:
+            for message in messages:
+                try:
+                    transport.send(settings.EMAIL_FROM, message.recipient, message.subject, message.body)
+                except PermanentDeliveryError as exc:
+                    outcomes[message.id] = (FAILED, str(exc))
+                except TransportUnavailable as exc:
+                    logger.warning(f"Email transport unavailable: {exc}")
+                    for pending in messages:
+                        outcomes.setdefault(pending.id, (PENDING, str(exc)))
+                    break
+                except Exception as exc:
+                    outcomes[message.id] = (PENDING, str(exc))
+                else:
+                    outcomes[message.id] = (SENT, None)
+        finally:
+            transport.close()
+        return outcomes
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** max(attempts - 1, 0))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _record(self, messages: List[models.EmailOutbox], outcomes: dict) -> None:
+        now = utcnow()
+        rows = []
+        for message in messages:
+            status, error = outcomes[message.id]
+            row = {"id": message.id, "status": status, "last_error": error,
+                   "next_attempt_at": message.next_attempt_at, "sent_at": None}
+            if status == SENT:
+                row["sent_at"] = now
+                self.sent_total += 1
+            elif status == PENDING and message.attempts < self.max_attempts:
+                row["next_attempt_at"] = now + datetime.timedelta(seconds=self.retry_delay(message.attempts))
+                self.retried_total += 1
+            else:
+                row["status"] = FAILED
+                self.failed_total += 1
+                logger.error(f"Giving up on email {message.id} to {message.recipient}: {error}")
+            rows.append(row)
+        async with self.session_factory() as db:
+            await db.execute(update(models.EmailOutbox), rows)
+            await db.commit()
+
+    async def backlog(self) -> dict:
+        async with self.session_factory() as db:
+            counts = dict((await db.execute(
+                select(models.EmailOutbox.status, func.count()).group_by(models.EmailOutbox.status)
+            )).all())
+        return {status: counts.get(status, 0) for status in (PENDING, SENT, FAILED)}
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "batches_total": self.batches_total,
+            "sent_total": self.sent_total,
+            "retried_total": self.retried_total,
+            "failed_total": self.failed_total,
+        }
+
+outbox_worker = OutboxWorker(
+    batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE,
+    poll_interval=settings.EMAIL_OUTBOX_POLL_SECONDS,
+    max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    backoff=settings.EMAIL_OUTBOX_BACKOFF_SECONDS,
+    max_backoff=settings.EMAIL_OUTBOX_MAX_BACKOFF_SECONDS,
+    lease=settings.EMAIL_OUTBOX_LEASE_SECONDS,
+)
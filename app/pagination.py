@@ -0,0 +1,44 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row on a page into an opaque token."""
+    payload = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Unpack a token from ``encode_cursor``, coercing each value to ``types``."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(
+            datetime.datetime.fromisoformat(value) if type_ is datetime.datetime else type_(value)
+            for value, type_ in zip(values, types)
+        )
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def next_cursor(rows: list, limit: int, key) -> Optional[str]:
+    """Cursor for the following page, or None when this page was the last one."""
+    if limit and len(rows) == limit:
+        return encode_cursor(*key(rows[-1]))
+    return None
+
+def set_next_cursor(response: Response, rows: list, limit: int, key) -> None:
+    """Advertise the cursor for the following page when this one came back full."""
+    cursor = next_cursor(rows, limit, key)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
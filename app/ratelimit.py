@@ -0,0 +1,69 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+class TokenBucketLimiter:
+    """Token bucket per key, kept in an LRU bounded to ``maxsize`` keys.
+
+    Each key starts with ``capacity`` tokens and regains ``refill_per_second``.
+    A bucket that has refilled is the same as no bucket at all, so evicting
+    the least recently used keys only ever forgets ones that went quiet.
+    """
+
+    def __init__(self, capacity: int, refill_per_second: float, maxsize: int):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.allowed = 0
+        self.throttled = 0
+        self.evictions = 0
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return float(self.capacity)
+        tokens, updated = bucket
+        return min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+
+    def _store(self, key: Hashable, tokens: float, now: float) -> None:
+        if tokens >= self.capacity:
+            self._buckets.pop(key, None)
+            return
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+    def acquire(self, key: Hashable) -> float:
+        """Take a token for ``key``: 0 if granted, else seconds until one is due."""
+        now = time.monotonic()
+        tokens = self._tokens(key, now)
+        # Rejections refresh the key too, so a hammering client stays tracked.
+        self._store(key, tokens - 1 if tokens >= 1 else tokens, now)
+        if tokens >= 1:
+            self.allowed += 1
+            return 0.0
+        self.throttled += 1
+        return (1 - tokens) / self.refill_per_second
+
+    def refund(self, key: Hashable) -> None:
+        if key in self._buckets:
+            now = time.monotonic()
+            self._store(key, self._tokens(key, now) + 1, now)
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "maxsize": self.maxsize,
+            "capacity": self.capacity,
+            "refill_per_second": self.refill_per_second,
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "evictions": self.evictions,
+        }
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
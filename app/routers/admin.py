@@ -1,124 +1,363 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session, aliased
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select, func, case, and_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from typing import List, Optional
+import csv
 import datetime
+import io
+import json
 
-from .. import models, schemas
-from ..database import get_db
-from .auth import check_admin_access
+from .. import models, schemas, utils
+from ..config import settings
+from ..database import get_read_db, open_read_session, pool_stats
+from ..logging_config import log_queue_stats
+from ..outbox import outbox_worker
+from ..pagination import NEXT_CURSOR_HEADER, decode_cursor, next_cursor
+from ..serialization import BOOK_FIELDS, LOAN_FIELDS, USER_FIELDS, columns, record
+from .auth import check_admin_access, login_limiter_stats, user_cache
+from .books import catalog_cache
 
 router = APIRouter(tags=["admin"], prefix="/admin")
 
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "id", "user_id", "username", "book_id", "title", "isbn",
+    "borrow_date", "return_date", "due_date", "duration_days", "is_overdue",
+]
+
+def filter_borrowings(
+    query,
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    active_only: bool = False,
+    overdue_only: bool = False,
+    start_date: Optional[datetime.datetime] = None,
+    end_date: Optional[datetime.datetime] = None
+):
+    if user_id:
+        query = query.filter(models.BorrowedBook.user_id == user_id)
+    if book_id:
+        query = query.filter(models.BorrowedBook.book_id == book_id)
+    if active_only:
+        query = query.filter(models.BorrowedBook.return_date.is_(None))
+    if start_date:
+        query = query.filter(models.BorrowedBook.borrow_date >= start_date)
+    if end_date:
+        query = query.filter(models.BorrowedBook.borrow_date <= end_date)
+    if overdue_only:
+        query = query.filter(overdue_loans())
+    return query
+
+def overdue_loans():
+    """Unreturned loans past their due date; matches ix_borrowed_books_active_due_date."""
+    return and_(
+        models.BorrowedBook.return_date.is_(None),
+        models.BorrowedBook.due_date < utils.utcnow()
+    )
+
+def loan_duration(
+    borrow_date: datetime.datetime,
+    return_date: Optional[datetime.datetime],
+    due_date: Optional[datetime.datetime]
+):
+    """Days on loan so far (or in total, once returned) and whether it ran past the due date."""
+    end = return_date or utils.utcnow()
+    duration = (end - borrow_date).total_seconds() / 86400
+    due_date = due_date or borrow_date + datetime.timedelta(days=settings.LOAN_PERIOD_DAYS)
+    return round(duration, 2), end > due_date
+
 @router.get("/users", response_model=List[schemas.UserWithStats])
 async def list_users(
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=10, ge=1, le=100),
     active_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(check_admin_access)
 ):
-    query = db.query(models.User)
+    query = select(models.User.id)
     
     if active_only:
         query = query.filter(models.User.is_active == True)
     
-    users = query.offset(skip).limit(limit).all()
+    page = query.order_by(models.User.id).offset(skip).limit(limit).subquery()
+
+    active = models.BorrowedBook.return_date.is_(None)
+    overdue = overdue_loans()
+
+    # One grouped pass over the page's loans instead of three COUNTs per user.
+    stats = (
+        select(
+            models.BorrowedBook.user_id,
+            func.count().label("total_books_borrowed"),
+            func.sum(case((active, 1), else_=0)).label("active_borrowings"),
+            func.sum(case((overdue, 1), else_=0)).label("overdue_borrowings")
+        )
+        .filter(models.BorrowedBook.user_id.in_(select(page.c.id)))
+        .group_by(models.BorrowedBook.user_id)
+        .subquery()
+    )
+
+    rows = await db.execute(
+        select(
+            *columns(models.User, USER_FIELDS),
+            func.coalesce(stats.c.total_books_borrowed, 0),
+            func.coalesce(stats.c.active_borrowings, 0),
+            func.coalesce(stats.c.overdue_borrowings, 0)
+        )
+        .join(page, page.c.id == models.User.id)
+        .outerjoin(stats, stats.c.user_id == models.User.id)
+        .order_by(models.User.id)
+    )
     
-    users_with_stats = []
-    for user in users:
-        total_borrowed = db.query(models.BorrowedBook).filter(
-            models.BorrowedBook.user_id == user.id
-        ).count()
-        
-        active_borrowings = db.query(models.BorrowedBook).filter(
-            models.BorrowedBook.user_id == user.id,
-            models.BorrowedBook.return_date.is_(None)
-        ).count()
-        
-        overdue_date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=14)
-        overdue_borrowings = db.query(models.BorrowedBook).filter(
-            models.BorrowedBook.user_id == user.id,
-            models.BorrowedBook.return_date.is_(None),
-            models.BorrowedBook.borrow_date < overdue_date
-        ).count()
-        
-        user_dict = {
-            **user.__dict__,
-            'total_books_borrowed': total_borrowed,
-            'active_borrowings': active_borrowings,
-            'overdue_borrowings': overdue_borrowings
+    # Only the response's columns are selected, never the password hash.
+    user_end = len(USER_FIELDS)
+    return ORJSONResponse([
+        {
+            **record(USER_FIELDS, row[:user_end]),
+            "total_books_borrowed": row[user_end],
+            "active_borrowings": row[user_end + 1],
+            "overdue_borrowings": row[user_end + 2]
         }
-        users_with_stats.append(user_dict)
-    
-    return users_with_stats
+        for row in rows
+    ])
 
 @router.get("/borrowing-history", response_model=List[schemas.BorrowingHistory])
 async def get_borrowing_history(
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
     user_id: Optional[int] = None,
     book_id: Optional[int] = None,
     active_only: bool = False,
     overdue_only: bool = False,
     start_date: Optional[datetime.datetime] = None,
     end_date: Optional[datetime.datetime] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(check_admin_access)
 ):
     UserAlias = aliased(models.User)
     BookAlias = aliased(models.Book)
 
     query = (
-        db.query(
-            models.BorrowedBook,
-            UserAlias,
-            BookAlias
+        select(
+            *columns(models.BorrowedBook, LOAN_FIELDS),
+            *columns(UserAlias, USER_FIELDS),
+            *columns(BookAlias, BOOK_FIELDS)
         )
         .join(UserAlias, models.BorrowedBook.user_id == UserAlias.id)  
         .join(BookAlias, models.BorrowedBook.book_id == BookAlias.id)
     )
+    query = filter_borrowings(query, user_id, book_id, active_only, overdue_only, start_date, end_date)
 
-    if user_id:
-        query = query.filter(models.BorrowedBook.user_id == user_id)
-    if book_id:
-        query = query.filter(models.BorrowedBook.book_id == book_id)
-    if active_only:
-        query = query.filter(models.BorrowedBook.return_date.is_(None))
-    if start_date:
-        query = query.filter(models.BorrowedBook.borrow_date >= start_date)
-    if end_date:
-        query = query.filter(models.BorrowedBook.borrow_date <= end_date)
-    if overdue_only:
-        overdue_date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=14)
+    if cursor:
+        last_borrow_date, last_id = decode_cursor(cursor, datetime.datetime, int)
         query = query.filter(
-            models.BorrowedBook.return_date.is_(None),
-            models.BorrowedBook.borrow_date < overdue_date
+            tuple_(models.BorrowedBook.borrow_date, models.BorrowedBook.id) < tuple_(last_borrow_date, last_id)
         )
+    else:
+        query = query.offset(skip)
 
-    query = query.order_by(models.BorrowedBook.borrow_date.desc())
+    query = query.order_by(models.BorrowedBook.borrow_date.desc(), models.BorrowedBook.id.desc())
 
-    borrowings = query.offset(skip).limit(limit).all()
+    borrowings = (await db.execute(query.limit(limit))).all()
 
+    # Rows go straight from column tuples to orjson; response_model only documents the shape.
+    loan_end = len(LOAN_FIELDS)
+    user_end = loan_end + len(USER_FIELDS)
     result = []
-    for borrowing, user, book in borrowings:
-        if borrowing.return_date:
-            duration = (borrowing.return_date - borrowing.borrow_date).total_seconds() / 86400
-            is_overdue = duration > 14
-        else:
-            duration = (datetime.datetime.now().replace(tzinfo=None) - borrowing.borrow_date).total_seconds() / 86400
-            is_overdue = duration > 14
-
-        borrowing_dict = schemas.BorrowingHistory(
-            id=borrowing.id,
-            user_id=borrowing.user_id,  
-            book_id=borrowing.book_id, 
-            user=schemas.UserOut.model_validate(user.__dict__),  
-            book=schemas.BookOut.model_validate(book.__dict__), 
-            borrow_date=borrowing.borrow_date,
-            return_date=borrowing.return_date,
-            duration_days=round(duration, 2),
-            is_overdue=is_overdue
+    for row in borrowings:
+        borrowing = record(LOAN_FIELDS, row[:loan_end])
+        duration, is_overdue = loan_duration(borrowing["borrow_date"], borrowing["return_date"], borrowing["due_date"])
+        result.append({
+            **borrowing,
+            "user": record(USER_FIELDS, row[loan_end:user_end]),
+            "book": record(BOOK_FIELDS, row[user_end:]),
+            "duration_days": duration,
+            "is_overdue": is_overdue
+        })
+
+    headers = {}
+    following = next_cursor(result, limit, lambda loan: (loan["borrow_date"], loan["id"]))
+    if following:
+        headers[NEXT_CURSOR_HEADER] = following
+
+    return ORJSONResponse(result, headers=headers)
+
+async def stream_borrowing_export(request: Request, query, export_format: str):
+    # The request's session is closed before a streamed body is sent, so the export owns its own.
+    async with await open_read_session(request) as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if export_format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\n"
+        async for partition in result.partitions():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            for row in partition:
+                duration, is_overdue = loan_duration(row.borrow_date, row.return_date, row.due_date)
+                values = [
+                    row.id, row.user_id, row.username, row.book_id, row.title, row.isbn,
+                    row.borrow_date.isoformat(),
+                    row.return_date.isoformat() if row.return_date else None,
+                    row.due_date.isoformat() if row.due_date else None,
+                    duration, is_overdue,
+                ]
+                if export_format == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values))) + "\n")
+            yield buffer.getvalue()
+
+@router.get("/borrowing-history/export")
+async def export_borrowing_history(
+    request: Request,
+    export_format: str = Query(default="ndjson", alias="format", pattern="^(csv|ndjson)$"),
+    user_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    active_only: bool = False,
+    overdue_only: bool = False,
+    start_date: Optional[datetime.datetime] = None,
+    end_date: Optional[datetime.datetime] = None,
+    current_user: models.User = Depends(check_admin_access)
+):
+    query = (
+        select(
+            models.BorrowedBook.id,
+            models.BorrowedBook.user_id,
+            models.User.username,
+            models.BorrowedBook.book_id,
+            models.Book.title,
+            models.Book.isbn,
+            models.BorrowedBook.borrow_date,
+            models.BorrowedBook.return_date,
+            models.BorrowedBook.due_date
+        )
+        .join(models.User, models.BorrowedBook.user_id == models.User.id)
+        .join(models.Book, models.BorrowedBook.book_id == models.Book.id)
+    )
+    query = filter_borrowings(query, user_id, book_id, active_only, overdue_only, start_date, end_date)
+    query = query.order_by(models.BorrowedBook.borrow_date.desc(), models.BorrowedBook.id.desc())
+
+    if export_format == "csv":
+        return StreamingResponse(
+            stream_borrowing_export(request, query, export_format),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="borrowing-history.csv"'}
+        )
+    return StreamingResponse(stream_borrowing_export(request, query, export_format), media_type="application/x-ndjson")
+
+ANALYTICS_ORDERS = {
+    "total_loans": models.BookCirculation.total_loans,
+    "active_loans": models.BookCirculation.active_loans,
+}
+
+@router.get("/analytics/books", response_model=List[schemas.BookCirculationOut])
+async def most_borrowed_books(
+    order: str = Query(default="total_loans", pattern="^(total_loans|active_loans)$"),
+    limit: int = Query(default=10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(check_admin_access)
+):
+    # Read from the rollup's (counter, book_id) index, so the cost doesn't grow with loan history.
+    counter = ANALYTICS_ORDERS[order]
+    rows = await db.execute(
+        select(
+            models.BookCirculation.book_id,
+            models.Book.title,
+            models.BookCirculation.total_loans,
+            models.BookCirculation.active_loans,
+            models.BookCirculation.last_borrowed_at
+        )
+        .join(models.Book, models.Book.id == models.BookCirculation.book_id)
+        .order_by(counter.desc(), models.BookCirculation.book_id.desc())
+        .limit(limit)
+    )
+    return [row._asdict() for row in rows]
+
+@router.get("/analytics/books/{book_id}", response_model=schemas.BookCirculationOut)
+async def book_circulation(
+    book_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(check_admin_access)
+):
+    row = (await db.execute(
+        select(
+            models.Book.id.label("book_id"),
+            models.Book.title,
+            func.coalesce(models.BookCirculation.total_loans, 0).label("total_loans"),
+            func.coalesce(models.BookCirculation.active_loans, 0).label("active_loans"),
+            models.BookCirculation.last_borrowed_at
         )
-        result.append(borrowing_dict)
+        .outerjoin(models.BookCirculation, models.BookCirculation.book_id == models.Book.id)
+        .filter(models.Book.id == book_id)
+    )).first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    return row._asdict()
+
+@router.get("/analytics/daily", response_model=List[schemas.DailyCirculationOut])
+async def daily_circulation(
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(check_admin_access)
+):
+    end_date = end_date or utils.utcnow().date()
+    start_date = start_date or end_date - datetime.timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must not be after end_date"
+        )
+    if (end_date - start_date).days >= 366:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date range cannot exceed 366 days"
+        )
+    # Days without any activity have no row.
+    return (await db.scalars(
+        select(models.DailyCirculation)
+        .filter(models.DailyCirculation.day.between(start_date, end_date))
+        .order_by(models.DailyCirculation.day)
+    )).all()
+
+@router.get("/password-pool")
+async def password_pool_stats(
+    current_user: models.User = Depends(check_admin_access)
+):
+    return utils.password_pool.stats()
+
+@router.get("/cache-stats")
+async def cache_stats(
+    current_user: models.User = Depends(check_admin_access)
+):
+    return {"users": user_cache.stats(), **catalog_cache.stats()}
 
-    return result
\ No newline at end of file
+@router.get("/log-stats")
+async def log_stats(
+    current_user: models.User = Depends(check_admin_access)
+):
+    return log_queue_stats()
+
+@router.get("/email-outbox")
+async def email_outbox_stats(
+    current_user: models.User = Depends(check_admin_access)
+):
+    return {"backlog": await outbox_worker.backlog(), "worker": outbox_worker.stats()}
+
+@router.get("/db-pool")
+async def db_pool_stats(
+    current_user: models.User = Depends(check_admin_access)
+):
+    return pool_stats()
+
+@router.get("/login-limiter")
+async def login_limiter(
+    current_user: models.User = Depends(check_admin_access)
+):
+    return login_limiter_stats()
\ No newline at end of file
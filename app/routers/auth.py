@@ -1,18 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import Annotated
 from jose import JWTError, jwt
 
 from .. import models, schemas, utils
-from ..database import get_db
+from ..cache import TTLCache
+from ..config import settings
+from ..database import get_async_db
+from ..outbox import confirmation_email, outbox_worker
+from ..ratelimit import TokenBucketLimiter, retry_after_header
 from ..utils import (
-    send_confirmation_email,
-    send_confirmation_email_demo,
-    verify_password,
+    verify_password_async,
     create_access_token,
-    get_password_hash,
+    get_password_hash_async,
     oauth2_scheme,
     SECRET_KEY,
     ALGORITHM
@@ -20,9 +23,40 @@ from ..utils import (
 
 router = APIRouter(tags=["auth"], prefix="/auth")
 
+# Authenticated users keyed by username, detached from the session that loaded them.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+# Login attempts per client IP and per username, checked before any bcrypt work.
+login_ip_limiter = TokenBucketLimiter(
+    capacity=settings.LOGIN_RATE_IP_BURST,
+    refill_per_second=settings.LOGIN_RATE_IP_PER_MINUTE / 60,
+    maxsize=settings.LOGIN_RATE_MAX_KEYS,
+)
+login_username_limiter = TokenBucketLimiter(
+    capacity=settings.LOGIN_RATE_USERNAME_BURST,
+    refill_per_second=settings.LOGIN_RATE_USERNAME_PER_MINUTE / 60,
+    maxsize=settings.LOGIN_RATE_MAX_KEYS,
+)
+
+def login_limiter_stats() -> dict:
+    return {"ip": login_ip_limiter.stats(), "username": login_username_limiter.stats()}
+
+def invalidate_cached_user(username: str):
+    user_cache.invalidate(username)
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    user = user_cache.get(username)
+    if user is None:
+        user = await db.scalar(select(models.User).filter(models.User.username == username))
+        if user is not None:
+            db.expunge(user)
+            user_cache.set(username, user)
+    return user
+
 async def get_current_user(
+    request: Request,
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> models.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -30,16 +64,23 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
+    # The logging middleware has usually decoded this token already.
+    if getattr(request.state, "token", None) == token:
+        payload = request.state.token_payload
+    else:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            payload = None
+    if payload is None:
+        raise credentials_exception
+
+    username: str = payload.get("sub")
+    if username is None:
         raise credentials_exception
+    token_data = schemas.TokenData(username=username)
         
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    user = await get_user_by_username(db, token_data.username)
     if user is None:
         raise credentials_exception
     return user
@@ -60,42 +101,58 @@ async def check_admin_access(current_user: models.User = Depends(get_current_act
     return current_user
 
 @router.post("/register", response_model=schemas.UserOut)
-async def register_user(user: schemas.UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User).filter(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
         password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    background_tasks.add_task(send_confirmation_email_demo, user.email, user.username)
+    # Queued in the same transaction, so a registered user always gets their mail.
+    db.add(confirmation_email(user.email, user.username))
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_cached_user(db_user.username)
+    outbox_worker.notify()
 
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
 async def login_for_access_token(
+    request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+    client_ip = request.client.host if request.client else ""
+    # Bounded, so long made-up usernames can't inflate the limiter's memory.
+    username_key = form_data.username[:256]
+    wait = login_ip_limiter.acquire(client_ip) or login_username_limiter.acquire(username_key)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": retry_after_header(wait)},
+        )
+
+    user = await db.scalar(select(models.User).filter(models.User.username == form_data.username))
+    if not user or not await verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Only failed attempts count against the username, so a guesser can't lock its owner out for long.
+    login_username_limiter.refund(username_key)
     access_token_expires = timedelta(minutes=utils.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -115,21 +172,21 @@ async def refresh_token(
 @router.post("/create_admin", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
 async def create_admin_user(
     user: schemas.UserCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserOut = Depends(get_current_user)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized") 
 
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
  
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -137,8 +194,9 @@ async def create_admin_user(
         is_admin=True
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_cached_user(db_user.username)
     return db_user
 
 @router.get("/users/me", response_model=schemas.UserOut)
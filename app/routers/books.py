@@ -1,39 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import date
 
 from .. import models, schemas
-from ..database import get_db
+from ..bulk_import import IMPORT_FORMATS, BookImport, iter_records
+from ..cache import CachedResponse, CatalogCache
+from ..config import settings
+from ..database import get_async_db
+from ..pagination import NEXT_CURSOR_HEADER, decode_cursor, next_cursor
+from ..search import book_search_query
+from ..serialization import BOOK_FIELDS, columns, record
 from .auth import check_admin_access
 
 router = APIRouter(tags=["books"], prefix="/books")
 
+catalog_cache = CatalogCache(maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL_SECONDS)
+
 @router.get("/", response_model=List[schemas.BookOut])
 async def list_books(
+    request: Request,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    q: Optional[str] = Query(default=None, min_length=1, max_length=200),
     title: Optional[str] = None,
     author: Optional[str] = None,
-    db: Session = Depends(get_db)
+    # The primary, not a replica: what is read here is cached, and a lagging
+    # replica would keep serving from the cache after it caught up.
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(models.Book)
+    key = (skip, limit, cursor, q, title, author)
+    cached = catalog_cache.listings.get(key)
+    if cached is not None:
+        return cached.to_response(request)
+    version = catalog_cache.version
+
+    query = book_search_query(db.get_bind().dialect.name, q) if q else select(models.Book)
+    # Plain column tuples: no ORM identity map or response_model validation on the hot path.
+    book_columns = columns(models.Book, BOOK_FIELDS)
     
     if title:
         query = query.filter(models.Book.title.ilike(f"%{title}%"))
     if author:
         query = query.filter(models.Book.author.ilike(f"%{author}%"))
     
-    books = query.offset(skip).limit(limit).all()
-    return books
+    headers = {}
+    if q:
+        # Ranked search results are paged by offset; cursors follow id order.
+        books = (await db.execute(query.with_only_columns(*book_columns).offset(skip).limit(limit))).all()
+    else:
+        if cursor:
+            (last_id,) = decode_cursor(cursor, int)
+            query = query.filter(models.Book.id > last_id)
+        else:
+            query = query.offset(skip)
+        
+        books = (await db.execute(query.with_only_columns(*book_columns).order_by(models.Book.id).limit(limit))).all()
+        following = next_cursor(books, limit, lambda book: (book.id,))
+        if following:
+            headers[NEXT_CURSOR_HEADER] = following
+    
+    entry = CachedResponse.build(
+        [record(BOOK_FIELDS, book) for book in books],
+        book_ids=(book.id for book in books),
+        headers=headers
+    )
+    catalog_cache.store_listing(key, entry, version)
+    return entry.to_response(request)
 
 @router.post("/", response_model=schemas.BookOut, status_code=status.HTTP_201_CREATED)
 async def create_book(
     book: schemas.BookCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(check_admin_access)
 ):
-    db_book = db.query(models.Book).filter(models.Book.isbn == book.isbn).first()
+    db_book = await db.scalar(select(models.Book).filter(models.Book.isbn == book.isbn))
     if db_book:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -46,34 +89,71 @@ async def create_book(
         published_date=book.published_date,
         isbn=book.isbn,
         total_copies=book.total_copies,
-        available_copies=book.total_copies
+        available_copies=book.total_copies,
+        loan_period_days=book.loan_period_days
     )
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
+    catalog_cache.invalidate_catalog(db_book.id)
     return db_book
 
+@router.post("/import", response_model=schemas.BookImportResult)
+async def import_books(
+    request: Request,
+    import_format: Optional[str] = Query(default=None, alias="format", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(check_admin_access)
+):
+    if import_format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        import_format = IMPORT_FORMATS.get(content_type)
+    if import_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+        )
+    
+    importer = BookImport(
+        db,
+        batch_size=settings.BOOK_IMPORT_BATCH_SIZE,
+        max_reported_errors=settings.BOOK_IMPORT_MAX_REPORTED_ERRORS
+    )
+    result = await importer.run(iter_records(import_format, request.stream()))
+    if result.imported:
+        catalog_cache.invalidate_catalog()
+    return result
+
 @router.get("/{book_id}", response_model=schemas.BookOut)
 async def get_book(
     book_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    # The primary, as for list_books; only cache misses reach it.
+    db: AsyncSession = Depends(get_async_db)
 ):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    cached = catalog_cache.books.get(book_id)
+    if cached is not None:
+        return cached.to_response(request)
+    version = catalog_cache.version
+
+    book = await db.scalar(select(models.Book).filter(models.Book.id == book_id))
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found"
         )
-    return book
+    entry = CachedResponse.build(schemas.BookOut.model_validate(book, from_attributes=True), book_ids=[book.id])
+    catalog_cache.store_book(book_id, entry, version)
+    return entry.to_response(request)
 
 @router.put("/{book_id}", response_model=schemas.BookOut)
 async def update_book(
     book_id: int,
     book_update: schemas.BookCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(check_admin_access)
 ):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    db_book = await db.scalar(select(models.Book).filter(models.Book.id == book_id))
     if not db_book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -81,7 +161,7 @@ async def update_book(
         )
     
     if book_update.isbn != db_book.isbn:
-        existing_book = db.query(models.Book).filter(models.Book.isbn == book_update.isbn).first()
+        existing_book = await db.scalar(select(models.Book).filter(models.Book.isbn == book_update.isbn))
         if existing_book:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -95,27 +175,28 @@ async def update_book(
         borrowed_copies = db_book.total_copies - db_book.available_copies
         db_book.available_copies = max(0, book_update.total_copies - borrowed_copies)
     
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
+    catalog_cache.invalidate_catalog(book_id)
     return db_book
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(check_admin_access)
 ):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    db_book = await db.scalar(select(models.Book).filter(models.Book.id == book_id))
     if not db_book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found"
         )
     
-    active_borrowings = db.query(models.BorrowedBook).filter(
+    active_borrowings = await db.scalar(select(models.BorrowedBook).filter(
         models.BorrowedBook.book_id == book_id,
         models.BorrowedBook.return_date.is_(None)
-    ).first()
+    ))
     
     if active_borrowings:
         raise HTTPException(
@@ -123,6 +204,10 @@ async def delete_book(
             detail="Cannot delete book with active borrowings"
         )
     
-    db.delete(db_book)
-    db.commit()
+    # SQLite doesn't enforce the cascade, and may hand the id to the next new book.
+    await db.execute(delete(models.BookCirculation).filter(models.BookCirculation.book_id == book_id))
+    await db.execute(delete(models.BookHold).filter(models.BookHold.book_id == book_id))
+    await db.delete(db_book)
+    await db.commit()
+    catalog_cache.invalidate_catalog(book_id)
     return None
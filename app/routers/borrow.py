@@ -1,70 +1,239 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select, update, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import datetime
 
-from .. import models, schemas
-from ..database import get_db
+from .. import circulation, holds, models, schemas
+from ..config import settings
+from ..database import get_async_db, get_read_db
+from ..pagination import decode_cursor, set_next_cursor
+from ..serialization import BOOK_FIELDS, LOAN_FIELDS, columns, record
+from ..utils import utcnow
 from .auth import get_current_active_user
+from .books import catalog_cache
 
 router = APIRouter(tags=["borrowing"])
 
+BATCH_DETAILS = {
+    "borrowed": None,
+    "returned": None,
+    "duplicate": "Book listed more than once",
+    "not_found": "Book not found",
+    "unavailable": "No copies available for borrowing",
+    "already_borrowed": "You already have an active borrowing for this book",
+    "not_borrowed": "No active borrowing found for this book",
+}
+
+def batch_result(book_ids: List[int], statuses: dict, loans: dict) -> schemas.BatchResult:
+    """One result per requested id, in request order; repeats of an id are reported as duplicates."""
+    seen = set()
+    results = []
+    for book_id in book_ids:
+        item_status = "duplicate" if book_id in seen else statuses[book_id]
+        seen.add(book_id)
+        loan = loans.get(book_id) if BATCH_DETAILS[item_status] is None else None
+        results.append(schemas.BatchItemResult(
+            book_id=book_id,
+            status=item_status,
+            detail=BATCH_DETAILS[item_status],
+            borrowing=schemas.BorrowedBookOut.model_validate(loan, from_attributes=True) if loan else None
+        ))
+    succeeded = sum(result.borrowing is not None for result in results)
+    return schemas.BatchResult(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+# Registered ahead of /borrow/{book_id} and /return/{book_id} so "batch" is not taken for an id.
+@router.post("/borrow/batch", response_model=schemas.BatchResult)
+async def borrow_books(
+    batch: schemas.BatchBookIds,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    book_ids = list(dict.fromkeys(batch.book_ids))
+    statuses = {}
+
+    already_borrowed = set((await db.scalars(select(models.BorrowedBook.book_id).filter(
+        models.BorrowedBook.user_id == current_user.id,
+        models.BorrowedBook.return_date.is_(None),
+        models.BorrowedBook.book_id.in_(book_ids)
+    ))).all())
+    statuses.update(dict.fromkeys(already_borrowed, "already_borrowed"))
+    candidates = [book_id for book_id in book_ids if book_id not in already_borrowed]
+
+    borrow_date = utcnow()
+    held = await holds.fulfil(db, current_user.id, candidates, borrow_date) if candidates else {}
+    set_aside = [book_id for book_id in candidates if held.get(book_id)]
+    to_claim = [book_id for book_id in candidates if not held.get(book_id)]
+
+    # One conditional UPDATE claims a copy of every available book in the batch.
+    claimed = {}
+    if to_claim:
+        claimed = dict((await db.execute(
+            update(models.Book)
+            .where(models.Book.id.in_(to_claim), models.Book.available_copies > 0)
+            .values(available_copies=models.Book.available_copies - 1)
+            .returning(models.Book.id, models.Book.loan_period_days)
+        )).all())
+    # Copies already set aside for this reader's holds need no claim.
+    if set_aside:
+        claimed.update((await db.execute(
+            select(models.Book.id, models.Book.loan_period_days).filter(models.Book.id.in_(set_aside))
+        )).all())
+
+    unclaimed = [book_id for book_id in to_claim if book_id not in claimed]
+    if unclaimed:
+        await holds.reopen(db, current_user.id, [book_id for book_id in unclaimed if book_id in held], borrow_date)
+        existing = set((await db.scalars(select(models.Book.id).filter(models.Book.id.in_(unclaimed)))).all())
+        for book_id in unclaimed:
+            statuses[book_id] = "unavailable" if book_id in existing else "not_found"
+
+    loans = {}
+    if claimed:
+        rows = [
+            {
+                "user_id": current_user.id,
+                "book_id": book_id,
+                "borrow_date": borrow_date,
+                "due_date": borrow_date + datetime.timedelta(days=loan_period_days or settings.LOAN_PERIOD_DAYS)
+            }
+            for book_id, loan_period_days in claimed.items()
+        ]
+        # A concurrent borrow of the same book can still win uq_borrowed_books_active_loan.
+        # Its row is skipped rather than failing the batch, and the copy goes back.
+        stmt = circulation.UPSERTS[db.get_bind().dialect.name](models.BorrowedBook)
+        inserted = await db.scalars(
+            stmt.on_conflict_do_nothing(
+                index_elements=[models.BorrowedBook.user_id, models.BorrowedBook.book_id],
+                index_where=models.BorrowedBook.return_date.is_(None),
+            ).returning(models.BorrowedBook),
+            rows
+        )
+        loans = {loan.book_id: loan for loan in inserted}
+        lost = [book_id for book_id in claimed if book_id not in loans]
+        ready = await holds.release_copies(db, lost, borrow_date) if lost else []
+        await circulation.record_borrows(db, list(loans), borrow_date)
+        await db.commit()
+        holds.hold_notifier.publish(holds.hold_event(hold) for hold in ready)
+        for book_id in claimed:
+            statuses[book_id] = "borrowed" if book_id in loans else "already_borrowed"
+            catalog_cache.invalidate_book(book_id)
+    else:
+        await db.rollback()
+
+    return batch_result(batch.book_ids, statuses, loans)
+
+@router.post("/return/batch", response_model=schemas.BatchResult)
+async def return_books(
+    batch: schemas.BatchBookIds,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    book_ids = list(dict.fromkeys(batch.book_ids))
+
+    return_date = utcnow()
+    returned = await db.scalars(
+        update(models.BorrowedBook)
+        .where(
+            models.BorrowedBook.user_id == current_user.id,
+            models.BorrowedBook.book_id.in_(book_ids),
+            models.BorrowedBook.return_date.is_(None)
+        )
+        .values(return_date=return_date)
+        .returning(models.BorrowedBook)
+    )
+    loans = {loan.book_id: loan for loan in returned}
+
+    # At most one open loan per user and book, so each returned book releases exactly one copy.
+    ready = []
+    if loans:
+        ready = await holds.release_copies(db, list(loans), return_date)
+        await circulation.record_returns(db, list(loans), return_date)
+    await db.commit()
+    holds.hold_notifier.publish(holds.hold_event(hold) for hold in ready)
+    for book_id in loans:
+        catalog_cache.invalidate_book(book_id)
+
+    statuses = {book_id: "returned" if book_id in loans else "not_borrowed" for book_id in book_ids}
+    return batch_result(batch.book_ids, statuses, loans)
+
 @router.post("/borrow/{book_id}", response_model=schemas.BorrowedBookOut)
 async def borrow_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ): 
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Book not found"
-        )
-    
-    if book.available_copies <= 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No copies available for borrowing"
-        )
-    
-    existing_borrow = db.query(models.BorrowedBook).filter(
-        models.BorrowedBook.user_id == current_user.id,
-        models.BorrowedBook.book_id == book_id,
-        models.BorrowedBook.return_date.is_(None)
-    ).first()
-    
-    if existing_borrow:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You already have an active borrowing for this book"
-        )
-    
+    borrow_date = utcnow()
+    held = await holds.fulfil(db, current_user.id, [book_id], borrow_date)
+    if held.get(book_id):
+        # The copy was set aside for this reader's hold when it came back.
+        loan_period_days = await db.scalar(select(models.Book.loan_period_days).filter(models.Book.id == book_id))
+    else:
+        # Claim a copy in one conditional UPDATE so concurrent borrowers can't oversell.
+        claimed = (await db.execute(
+            update(models.Book)
+            .where(models.Book.id == book_id, models.Book.available_copies > 0)
+            .values(available_copies=models.Book.available_copies - 1)
+            .returning(models.Book.id, models.Book.loan_period_days)
+        )).first()
+        if claimed is None:
+            # Also keeps a waiting hold open.
+            await db.rollback()
+            book_exists = await db.scalar(select(models.Book.id).filter(models.Book.id == book_id))
+            if not book_exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Book not found"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No copies available for borrowing"
+            )
+        loan_period_days = claimed.loan_period_days
+
+    loan_period = datetime.timedelta(days=loan_period_days or settings.LOAN_PERIOD_DAYS)
     borrowed_book = models.BorrowedBook(
         user_id=current_user.id,
         book_id=book_id,
-        borrow_date=datetime.datetime.now(datetime.timezone.utc)
+        borrow_date=borrow_date,
+        due_date=borrow_date + loan_period
     )
-    
-    book.available_copies -= 1
-    
     db.add(borrowed_book)
-    db.commit()
-    db.refresh(borrowed_book)
+    
+    # uq_borrowed_books_active_loan allows one open loan per user and book. The
+    # session doesn't autoflush, so the loan is inserted, and the index checked, at commit.
+    try:
+        await circulation.record_borrows(db, [book_id], borrow_date)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already have an active borrowing for this book"
+        )
+    catalog_cache.invalidate_book(book_id)
     
     return borrowed_book
 
 @router.post("/return/{book_id}", response_model=schemas.BorrowedBookOut)
 async def return_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    borrowed_book = db.query(models.BorrowedBook).filter(
-        models.BorrowedBook.user_id == current_user.id,
-        models.BorrowedBook.book_id == book_id,
-        models.BorrowedBook.return_date.is_(None)
-    ).first()
+    # Only one of several concurrent returns can close the loan, so the copy is released once.
+    return_date = utcnow()
+    borrowed_book = await db.scalar(
+        update(models.BorrowedBook)
+        .where(
+            models.BorrowedBook.user_id == current_user.id,
+            models.BorrowedBook.book_id == book_id,
+            models.BorrowedBook.return_date.is_(None)
+        )
+        .values(return_date=return_date)
+        .returning(models.BorrowedBook)
+    )
     
     if not borrowed_book:
         raise HTTPException(
@@ -72,37 +241,61 @@ async def return_book(
             detail="No active borrowing found for this book"
         )
     
-    borrowed_book.return_date = datetime.datetime.now(datetime.timezone.utc)
-    
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    book.available_copies += 1
+    # The copy goes to the next hold on the book if there is one, else back on the shelf.
+    ready = await holds.release_copies(db, [book_id], return_date)
+    await circulation.record_returns(db, [book_id], return_date)
     
-    db.commit()
-    db.refresh(borrowed_book)
+    await db.commit()
+    holds.hold_notifier.publish(holds.hold_event(hold) for hold in ready)
+    catalog_cache.invalidate_book(book_id)
     
     return borrowed_book
 
 @router.get("/borrowed", response_model=List[schemas.BorrowedBookOut])
 async def get_user_borrowed_books(
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    borrowed_books = db.query(models.BorrowedBook).filter(
+    query = select(*columns(models.BorrowedBook, LOAN_FIELDS)).filter(
         models.BorrowedBook.user_id == current_user.id
-    ).order_by(models.BorrowedBook.borrow_date.desc()).all()
+    ).order_by(models.BorrowedBook.borrow_date.desc(), models.BorrowedBook.id.desc())
+    
+    if cursor:
+        last_borrow_date, last_id = decode_cursor(cursor, datetime.datetime, int)
+        query = query.filter(
+            tuple_(models.BorrowedBook.borrow_date, models.BorrowedBook.id) < tuple_(last_borrow_date, last_id)
+        )
+    if limit:
+        query = query.limit(limit)
+    
+    # Plain rows rather than entities: nothing is added to the identity map.
+    borrowed_books = (await db.execute(query)).all()
+    set_next_cursor(response, borrowed_books, limit, lambda loan: (loan.borrow_date, loan.id))
     
     return borrowed_books
 
 @router.get("/borrowed/details", response_model=List[schemas.BorrowedBookWithDetails])
 async def get_user_borrowed_books_with_details(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    borrowed_books = db.query(models.BorrowedBook).filter(
+    rows = await db.execute(select(
+        *columns(models.BorrowedBook, LOAN_FIELDS),
+        *columns(models.Book, BOOK_FIELDS)
+    ).join(
+        models.Book, models.BorrowedBook.book_id == models.Book.id
+    ).filter(
         models.BorrowedBook.user_id == current_user.id
     ).order_by(
         models.BorrowedBook.return_date.is_(None).desc(),
         models.BorrowedBook.borrow_date.desc()
-    ).all()
+    ))
     
-    return borrowed_books
\ No newline at end of file
+    loan_width = len(LOAN_FIELDS)
+    return ORJSONResponse([
+        {**record(LOAN_FIELDS, row[:loan_width]), "book": record(BOOK_FIELDS, row[loan_width:])}
+        for row in rows
+    ])
\ No newline at end of file
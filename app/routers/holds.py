@@ -0,0 +1,163 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+import asyncio
+
+from .. import holds, models, schemas
+from ..config import settings
+from ..database import AsyncSessionLocal, get_async_db, get_read_db
+from ..serialization import dumps
+from ..utils import utcnow
+from .auth import get_current_active_user
+from .books import catalog_cache
+
+router = APIRouter(tags=["holds"], prefix="/holds")
+
+def sse_message(event: dict) -> bytes:
+    return b"id: %d\nevent: hold_ready\ndata: %s\n\n" % (event["id"], dumps(event))
+
+# Registered ahead of /holds/{book_id}.
+@router.get("/events")
+async def hold_events(
+    request: Request,
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Server-sent events: a ``hold_ready`` event whenever a copy is set aside for one of your holds.
+
+    Starts with the holds that are ready already, so a reconnecting client misses nothing.
+    """
+    user_id = current_user.id
+    queue = holds.hold_notifier.subscribe(user_id)
+
+    async def stream():
+        sent = set()
+        try:
+            # Its own short session: the stream outlives the request's dependencies.
+            async with AsyncSessionLocal() as db:
+                ready = (await db.scalars(select(models.BookHold).filter(
+                    models.BookHold.user_id == user_id,
+                    models.BookHold.status == holds.READY
+                ))).all()
+            for hold in ready:
+                sent.add(hold.id)
+                yield sse_message(holds.hold_event(hold))
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.HOLD_EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event["id"] not in sent:
+                    sent.add(event["id"])
+                    yield sse_message(event)
+        finally:
+            holds.hold_notifier.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("", response_model=List[schemas.BookHoldOut])
+async def list_holds(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    rows = await db.execute(
+        select(models.BookHold, holds.queue_position())
+        .filter(
+            models.BookHold.user_id == current_user.id,
+            models.BookHold.status.in_(holds.OPEN)
+        )
+        .order_by(models.BookHold.created_at, models.BookHold.id)
+    )
+    return [holds.hold_out(hold, position if hold.status == holds.WAITING else None) for hold, position in rows]
+
+@router.post("/{book_id}", response_model=schemas.BookHoldOut, status_code=status.HTTP_201_CREATED)
+async def place_hold(
+    book_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    available_copies = (await db.execute(
+        select(models.Book.available_copies).filter(models.Book.id == book_id)
+    )).scalar_one_or_none()
+    if available_copies is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    if available_copies > 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Copies are available, borrow the book instead"
+        )
+
+    active_loan = await db.scalar(select(models.BorrowedBook.id).filter(
+        models.BorrowedBook.user_id == current_user.id,
+        models.BorrowedBook.book_id == book_id,
+        models.BorrowedBook.return_date.is_(None)
+    ))
+    if active_loan:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already have an active borrowing for this book"
+        )
+
+    hold = models.BookHold(
+        book_id=book_id,
+        user_id=current_user.id,
+        status=holds.WAITING,
+        created_at=utcnow()
+    )
+    db.add(hold)
+    # uq_book_holds_open_hold allows one open hold per user and book.
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already have a hold on this book"
+        )
+
+    position = await db.scalar(select(holds.queue_position()).filter(models.BookHold.id == hold.id))
+    return holds.hold_out(hold, position)
+
+@router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_hold(
+    book_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    now = utcnow()
+    cancelled = (await db.execute(
+        update(models.BookHold)
+        .where(
+            models.BookHold.user_id == current_user.id,
+            models.BookHold.book_id == book_id,
+            models.BookHold.status.in_(holds.OPEN)
+        )
+        .values(status=holds.CANCELLED, closed_at=now)
+        .returning(models.BookHold.ready_at)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if cancelled is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No open hold found for this book"
+        )
+
+    # A copy set aside for this hold moves on to the next one.
+    ready = []
+    if cancelled.ready_at is not None:
+        ready = await holds.release_copies(db, [book_id], now)
+    await db.commit()
+    holds.hold_notifier.publish(holds.hold_event(hold) for hold in ready)
+    if cancelled.ready_at is not None:
+        catalog_cache.invalidate_book(book_id)
+    return None
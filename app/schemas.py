@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, constr
 from datetime import datetime, date
-from typing import Optional
+from typing import List, Optional
 
 class Token(BaseModel):
     access_token: str
@@ -34,6 +34,7 @@ class BookBase(BaseModel):
     published_date: Optional[date]
     isbn: str = Field(..., pattern="^(97(8|9))?\\d{9}(\\d|X)$")
     total_copies: int
+    loan_period_days: Optional[int] = Field(default=None, ge=1)
 
 class BookCreate(BookBase):
     pass
@@ -56,6 +57,18 @@ class BookOut(BookBase):
     class Config:
         orm_mode = True
 
+class BookImportError(BaseModel):
+    row: int
+    isbn: Optional[str] = None
+    errors: List[str]
+
+class BookImportResult(BaseModel):
+    rows_total: int
+    imported: int
+    failed: int
+    errors: List[BookImportError]
+    errors_truncated: bool = False
+
 class BorrowedBookBase(BaseModel):
     book_id: int
 
@@ -67,10 +80,51 @@ class BorrowedBookOut(BorrowedBookBase):
     user_id: int
     borrow_date: datetime
     return_date: Optional[datetime]
+    due_date: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class BatchBookIds(BaseModel):
+    book_ids: List[int] = Field(..., min_length=1, max_length=50)
+
+class BatchItemResult(BaseModel):
+    book_id: int
+    status: str
+    detail: Optional[str] = None
+    borrowing: Optional[BorrowedBookOut] = None
+
+class BatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+class BookHoldOut(BaseModel):
+    id: int
+    book_id: int
+    user_id: int
+    status: str
+    created_at: datetime
+    ready_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    # Holds ahead of this one; only set while waiting.
+    queue_position: Optional[int] = None
 
     class Config:
         orm_mode = True
 
+class BookCirculationOut(BaseModel):
+    book_id: int
+    title: str
+    total_loans: int
+    active_loans: int
+    last_borrowed_at: Optional[datetime]
+
+class DailyCirculationOut(BaseModel):
+    day: date
+    loans: int
+    returns: int
+
 class BorrowedBookWithDetails(BorrowedBookOut):
     book: BookOut
 
@@ -0,0 +1,46 @@
+import re
+from sqlalchemy import select, func, literal_column, or_, false, table, column
+from sqlalchemy.sql import Select
+
+from . import models
+
+# Must stay identical to the expression of ix_books_search_trgm so Postgres can use the index.
+BOOK_SEARCH_TEXT = literal_column(
+    "lower(coalesce(books.title, '') || ' ' || coalesce(books.author, '') || ' ' || coalesce(books.isbn, ''))"
+)
+
+books_fts = table("books_fts", column("rowid"), column("rank"))
+
+def fts_match_expression(q: str) -> str:
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    return " ".join(f'"{token}"*' for token in re.findall(r"\w+", q))
+
+def book_search_query(dialect_name: str, q: str) -> Select:
+    """Books matching ``q`` on title, author or ISBN, best matches first."""
+    if dialect_name == "postgresql":
+        term = q.lower()
+        return (
+            select(models.Book)
+            .filter(BOOK_SEARCH_TEXT.op("%>")(term))
+            .order_by(func.word_similarity(term, BOOK_SEARCH_TEXT).desc(), models.Book.id)
+        )
+
+    if dialect_name == "sqlite":
+        match = fts_match_expression(q)
+        query = select(models.Book).join(books_fts, books_fts.c.rowid == models.Book.id)
+        if not match:
+            return query.filter(false())
+        return (
+            query
+            .filter(literal_column("books_fts").op("MATCH")(match))
+            .order_by(books_fts.c.rank, models.Book.id)
+        )
+
+    pattern = f"%{q}%"
+    return select(models.Book).filter(
+        or_(
+            models.Book.title.ilike(pattern),
+            models.Book.author.ilike(pattern),
+            models.Book.isbn.ilike(pattern)
+        )
+    ).order_by(models.Book.id)
@@ -0,0 +1,27 @@
+from typing import Sequence
+
+import orjson
+from pydantic import BaseModel
+
+from . import schemas
+
+# Response fields in schema order, so rows built from them serialize to the
+# same keys and order FastAPI would produce from the response_model.
+BOOK_FIELDS = tuple(schemas.BookOut.model_fields)
+USER_FIELDS = tuple(schemas.UserOut.model_fields)
+LOAN_FIELDS = tuple(schemas.BorrowedBookOut.model_fields)
+
+def columns(entity, fields: Sequence[str]) -> list:
+    """The mapped columns of ``entity`` (a model or an alias) named by ``fields``."""
+    return [getattr(entity, field) for field in fields]
+
+def record(fields: Sequence[str], values: Sequence) -> dict:
+    return dict(zip(fields, values))
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default)
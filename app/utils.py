@@ -1,32 +1,109 @@
 from passlib.context import CryptContext
 from jose import jwt
+import asyncio
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from .config import settings
-import smtplib
-from email.mime.text import MIMEText
-from .main import logging
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-EMAIL_HOST = settings.EMAIL_HOST
-EMAIL_PORT = settings.EMAIL_PORT  
-EMAIL_USER = settings.EMAIL_USER 
-EMAIL_PASSWORD = settings.EMAIL_PASSWORD
-EMAIL_FROM = settings.EMAIL_FROM
-
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+def utcnow() -> datetime.datetime:
+    """Current UTC time as a naive datetime, the way the DateTime columns store it."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
+class PasswordHashPool:
+    """Runs bcrypt work on worker threads with bounded admission.
+
+    At most ``workers`` hashes run at once and at most ``max_waiting`` callers
+    queue behind them for up to ``queue_timeout`` seconds. Anything beyond
+    that is rejected with a 503 straight away instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_waiting: int, queue_timeout: float):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._semaphore = asyncio.Semaphore(workers)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed_total = 0
+        self.rejected_total = 0
+
+    def _reject(self):
+        self.rejected_total += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    async def run(self, func, *args):
+        if self.waiting >= self.max_waiting:
+            self._reject()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the thread is done, not when the caller stops waiting:
+        # a cancelled request leaves its hash running, and it still counts.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self.in_flight -= 1
+        self.completed_total += 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "saturation": round((self.in_flight + self.waiting) / (self.workers + self.max_waiting), 3),
+            "completed_total": self.completed_total,
+            "rejected_total": self.rejected_total,
+        }
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_waiting=settings.PASSWORD_HASH_MAX_WAITING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str):
+    return await password_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[datetime.timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -36,22 +113,3 @@ def create_access_token(data: dict, expires_delta: Optional[datetime.timedelta]
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
-
-def send_confirmation_email_demo(email: str, username: str):
-    print(f"Sending confirmation email to {email} for user {username}")
-
-def send_confirmation_email(email: str, username: str):
-    try:
-        message = MIMEText(f"Hello {username},\n\nThank you for registering!  Please confirm your email by clicking on this link: [link to confirmation page].") #Replace confirmation link
-        message["Subject"] = "Welcome to our platform!"
-        message["From"] = EMAIL_FROM
-        message["To"] = email
-
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()  # Use TLS encryption
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_FROM, email, message.as_string())
-
-        logging.info(f"Confirmation email sent to {email}")
-    except Exception as e:
-        logging.error(f"Error sending confirmation email to {email}: {e}")
\ No newline at end of file
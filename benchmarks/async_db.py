@@ -0,0 +1,106 @@
+"""Concurrent throughput of the blocking Session vs the AsyncSession.
+
+Runs the same slow query from many concurrent coroutines, once through a
+sync ``Session`` called inside ``async def`` (how the routers used to work)
+and once through an ``AsyncSession``. Reports wall time, queries/sec and the
+worst event-loop stall seen by a probe coroutine, which is what a cheap
+request like ``GET /books/`` waits behind while the slow queries run.
+
+    python -m benchmarks.async_db --concurrency 32 --rows 1500
+    python -m benchmarks.async_db --url postgresql://user:pw@localhost/db
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+SLOW_QUERY = text("SELECT count(*) FROM bench_rows a, bench_rows b WHERE a.n % 7 = b.n % 5")
+
+
+def seed(url: str, rows: int) -> None:
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_rows"))
+        conn.execute(text("CREATE TABLE bench_rows (n INTEGER)"))
+        conn.execute(text("INSERT INTO bench_rows (n) VALUES (:n)"), [{"n": i} for i in range(rows)])
+    engine.dispose()
+
+
+async def measure(handlers) -> tuple:
+    done = asyncio.Event()
+    max_lag = 0.0
+
+    async def probe():
+        nonlocal max_lag
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, time.perf_counter() - before - 0.001)
+
+    async def work():
+        await asyncio.gather(*handlers)
+        done.set()
+
+    start = time.perf_counter()
+    await asyncio.gather(probe(), work())
+    return time.perf_counter() - start, max_lag
+
+
+async def run_sync(url: str, concurrency: int) -> tuple:
+    engine = create_engine(url)
+    SessionLocal = sessionmaker(bind=engine)
+
+    async def handler():
+        with SessionLocal() as db:
+            db.execute(SLOW_QUERY).scalar()
+
+    result = await measure([handler() for _ in range(concurrency)])
+    engine.dispose()
+    return result
+
+
+async def run_async(url: str, concurrency: int) -> tuple:
+    scheme, _, rest = url.partition("://")
+    engine = create_async_engine(f"{ASYNC_DRIVERS[scheme]}://{rest}")
+    AsyncSessionLocal = async_sessionmaker(bind=engine)
+
+    async def handler():
+        async with AsyncSessionLocal() as db:
+            (await db.execute(SLOW_QUERY)).scalar()
+
+    result = await measure([handler() for _ in range(concurrency)])
+    await engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=1500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    seed(url, args.rows)
+    results = {}
+    for mode, runner in (("sync_session", run_sync), ("async_session", run_async)):
+        elapsed, max_lag = asyncio.run(runner(url, args.concurrency))
+        results[mode] = {
+            "wall_seconds": round(elapsed, 3),
+            "queries_per_second": round(args.concurrency / elapsed, 2),
+            "max_loop_stall_ms": round(max_lag * 1000, 1),
+        }
+    print(json.dumps({"concurrency": args.concurrency, "rows": args.rows, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
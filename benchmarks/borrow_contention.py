@@ -0,0 +1,135 @@
+"""Hundreds of concurrent borrowers racing for the copies of one book.
+
+Drives POST /borrow/{id} through the ASGI app in-process, then checks that
+exactly ``copies`` loans succeeded and ``available_copies`` never went
+negative, and reports request throughput. The same race is run first
+against the read-then-write borrow the endpoint used to be (read the book,
+check its copies, decrement in Python, commit), mounted on the app just for
+this script, and both runs are reported side by side. Only the current
+endpoint has to come out correct.
+
+    python -m benchmarks.borrow_contention --borrowers 300 --copies 25
+    python -m benchmarks.borrow_contention --mode conditional_update
+    python -m benchmarks.borrow_contention --url postgresql://user:pw@localhost/db
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+parser.add_argument("--borrowers", type=int, default=300)
+parser.add_argument("--copies", type=int, default=25)
+parser.add_argument("--mode", choices=["both", "read_then_write", "conditional_update"], default="both")
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+
+import httpx  # noqa: E402
+from fastapi import APIRouter, Depends, HTTPException  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from app.main import app  # noqa: E402
+from app import models, utils  # noqa: E402
+from app.database import Base, async_engine, engine, get_async_db  # noqa: E402
+from app.routers.auth import get_current_active_user  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+PATHS = {"read_then_write": "/bench/read-then-write/borrow/1", "conditional_update": "/borrow/1"}
+
+legacy = APIRouter()
+
+
+@legacy.post("/bench/read-then-write/borrow/{book_id}")
+async def borrow_read_then_write(
+    book_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    book = await db.scalar(select(models.Book).filter(models.Book.id == book_id))
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    if book.available_copies <= 0:
+        raise HTTPException(status_code=400, detail="No copies available for borrowing")
+    now = utils.utcnow()
+    db.add(models.BorrowedBook(user_id=current_user.id, book_id=book_id, borrow_date=now, due_date=now))
+    book.available_copies -= 1
+    await db.commit()
+    return {"book_id": book_id}
+
+
+app.include_router(legacy)
+
+
+def seed():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": i, "username": f"reader{i}", "email": f"reader{i}@example.com", "password": "-", "is_active": True, "is_admin": False}
+            for i in range(1, args.borrowers + 1)
+        ])
+        conn.execute(insert(models.Book), [{
+            "id": 1, "title": "Contended", "author": "Bench", "isbn": "9780000000000",
+            "total_copies": args.copies, "available_copies": args.copies,
+        }])
+
+
+async def race(path: str):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def borrow(i):
+            token = utils.create_access_token({"sub": f"reader{i}"})
+            response = await client.post(path, headers={"Authorization": f"Bearer {token}"})
+            return response.status_code
+
+        start = time.perf_counter()
+        codes = await asyncio.gather(*(borrow(i) for i in range(1, args.borrowers + 1)))
+        elapsed = time.perf_counter() - start
+    # No lifespan under ASGITransport, so close the pooled connections here.
+    await async_engine.dispose()
+    return codes, elapsed
+
+
+def run(mode: str) -> dict:
+    seed()
+    codes, elapsed = asyncio.run(race(PATHS[mode]))
+    with engine.connect() as conn:
+        available = conn.scalar(select(models.Book.available_copies).filter(models.Book.id == 1))
+        active_loans = conn.scalar(
+            select(func.count()).select_from(models.BorrowedBook).filter(models.BorrowedBook.return_date.is_(None))
+        )
+
+    succeeded = codes.count(200)
+    expected = min(args.copies, args.borrowers)
+    return {
+        "status_codes": {str(code): codes.count(code) for code in sorted(set(codes))},
+        "available_copies_after": available,
+        "active_loans_after": active_loans,
+        "correct": succeeded == expected == active_loans and available == args.copies - expected,
+        "wall_seconds": round(elapsed, 3),
+        "requests_per_second": round(args.borrowers / elapsed, 1),
+    }
+
+
+def main():
+    modes = list(PATHS) if args.mode == "both" else [args.mode]
+    report = {"borrowers": args.borrowers, "copies": args.copies}
+    for mode in modes:
+        report[mode] = run(mode)
+    print(json.dumps(report, indent=2))
+    if "conditional_update" in report and not report["conditional_update"]["correct"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Worker cold start: process launch to first served request, per schema mode.
+
+Builds the schema once with ``alembic upgrade head``, then repeatedly starts
+a fresh uvicorn worker in each ``SCHEMA_MANAGEMENT`` mode and polls
+``/health/live`` until it answers. Also times importing ``app.utils`` and
+``app.main`` in a fresh interpreter, since utils used to pull in the whole
+app through an import of ``app.main``.
+
+    python -m benchmarks.cold_start --repeat 5
+    python -m benchmarks.cold_start --url postgresql://user:pw@localhost/db
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+parser.add_argument("--repeat", type=int, default=5)
+parser.add_argument("--timeout", type=float, default=60.0)
+args = parser.parse_args()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+tmpdir = tempfile.mkdtemp()
+env = {
+    **os.environ,
+    "DATABASE_URL": args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+    "ALGORITHM": os.environ.get("ALGORITHM", "HS256"),
+    "ACCESS_TOKEN_EXPIRE_MINUTES": os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "30"),
+    "LOG_FILE": os.path.join(tmpdir, "bench.log"),
+    "PYTHONWARNINGS": "ignore",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def boot(mode: str) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**env, "SCHEMA_MANAGEMENT": mode},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < args.timeout:
+            if worker.poll() is not None:
+                raise SystemExit(f"worker in {mode} mode exited with {worker.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/live", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+        raise SystemExit(f"worker in {mode} mode did not answer within {args.timeout}s")
+    finally:
+        worker.terminate()
+        worker.wait()
+
+
+def import_seconds(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def median_ms(samples):
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def main():
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True, capture_output=True)
+    report = {"database": env["DATABASE_URL"].split(":", 1)[0], "repeat": args.repeat, "imports_ms": {}, "boot_to_first_request_ms": {}}
+    for module in ("app.utils", "app.main"):
+        report["imports_ms"][module] = median_ms([import_seconds(module) for _ in range(args.repeat)])
+    for mode in ("create_all", "alembic"):
+        samples = [boot(mode) for _ in range(args.repeat)]
+        report["boot_to_first_request_ms"][mode] = {
+            "median": median_ms(samples), "min": round(min(samples) * 1000, 1), "max": round(max(samples) * 1000, 1),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Deterministic synthetic dataset for benchmarks: users, books and loans.
+
+Rows come from a seeded RNG, so the same arguments always produce the same
+database. They are written with batched executemany inserts into tables whose
+secondary indexes are built afterwards. Every user is ``user<id>`` with
+password ``benchmark``; user 1 is also an admin. Active loans never repeat a
+(user, book) pair and ``available_copies`` accounts for them, so the data
+satisfies the same invariants the API maintains.
+
+    python -m benchmarks.datagen --users 100000 --books 1000000 --loans 10000000
+    python -m benchmarks.datagen --url postgresql://user:pw@localhost/db --loans 1000000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+PASSWORD = "benchmark"
+BATCH_SIZE = 50_000
+EPOCH = datetime.datetime(2026, 1, 1)
+LOAN_PERIOD = datetime.timedelta(days=14)
+
+
+def batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def active_pair(k: int, users: int, books: int):
+    """The k-th active loan: user k % users gets a book no other active loan of theirs holds."""
+    return k % users + 1, (k // users + k % users) % books + 1
+
+
+def seed(engine, users: int, books: int, loans: int, active_ratio: float = 0.05, seed: int = 42) -> dict:
+    """Drop and recreate the schema on ``engine`` and fill it. Returns row counts and timings."""
+    from sqlalchemy import event, insert
+    from app import circulation, models, utils
+    from app.database import Base
+
+    rng = random.Random(seed)
+    active = min(int(loans * active_ratio), users * books)
+    active_per_book = [0] * (books + 1)
+    for k in range(active):
+        active_per_book[active_pair(k, users, books)[1]] += 1
+
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def fast_sqlite(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA journal_mode=OFF")
+            dbapi_connection.execute("PRAGMA synchronous=OFF")
+        engine.dispose()
+
+    password = utils.get_password_hash(PASSWORD)
+
+    def user_rows():
+        for i in range(1, users + 1):
+            yield {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+                   "password": password, "is_active": True, "is_admin": i == 1}
+
+    def book_rows():
+        for i in range(1, books + 1):
+            spare = rng.randint(1, 5)
+            yield {"id": i, "title": f"Synthetic title {i}", "author": f"Author {i % 5000}",
+                   "published_date": datetime.date(1950 + i % 75, 1 + i % 12, 1 + i % 28),
+                   "isbn": f"978{i:010d}", "total_copies": spare + active_per_book[i], "available_copies": spare}
+
+    def loan_rows():
+        for k in range(loans):
+            if k < active:
+                user_id, book_id = active_pair(k, users, books)
+                borrow_date = EPOCH - datetime.timedelta(minutes=rng.randint(0, 30 * 24 * 60))
+                return_date = None
+            else:
+                user_id, book_id = rng.randint(1, users), rng.randint(1, books)
+                borrow_date = EPOCH - datetime.timedelta(minutes=rng.randint(30 * 24 * 60, 2 * 365 * 24 * 60))
+                return_date = borrow_date + datetime.timedelta(minutes=rng.randint(60, 30 * 24 * 60))
+            yield {"user_id": user_id, "book_id": book_id, "borrow_date": borrow_date, "return_date": return_date,
+                   "due_date": borrow_date + LOAN_PERIOD}
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    # Secondary indexes are dropped for the load and rebuilt once at the end,
+    # which is several times faster than maintaining them row by row.
+    tables = (models.User.__table__, models.Book.__table__, models.BorrowedBook.__table__)
+    deferred = [index for table in tables for index in table.indexes]
+    with engine.begin() as conn:
+        for index in deferred:
+            index.drop(conn)
+    timings = {}
+    for name, model, rows in (
+        ("users", models.User, user_rows()),
+        ("books", models.Book, book_rows()),
+        ("loans", models.BorrowedBook, loan_rows()),
+    ):
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            for batch in batched(rows):
+                conn.execute(insert(model), batch)
+        timings[f"{name}_seconds"] = round(time.perf_counter() - start, 2)
+
+    if engine.dialect.name == "postgresql":
+        # Users and books were given explicit ids; move their sequences past them for the app's inserts.
+        with engine.begin() as conn:
+            for table in ("users", "books"):
+                conn.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))")
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for index in deferred:
+            index.create(conn)
+    timings["indexes_seconds"] = round(time.perf_counter() - start, 2)
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        circulation.rebuild(conn)
+    timings["circulation_seconds"] = round(time.perf_counter() - start, 2)
+
+    if engine.dialect.name == "sqlite":
+        event.remove(engine, "connect", fast_sqlite)
+        engine.dispose()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    return {"users": users, "books": books, "loans": loans, "active_loans": active, "seed": seed, **timings}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--active-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+    os.environ.setdefault("LOG_FILE", os.path.join(tmpdir, "bench.log"))
+
+    from app.database import engine  # noqa: E402
+
+    result = seed(engine, args.users, args.books, args.loans, args.active_ratio, args.seed)
+    print(json.dumps({"url": os.environ["DATABASE_URL"], **result}, indent=2))
@@ -0,0 +1,208 @@
+"""Email outbox delivery against a local SMTP stand-in.
+
+Starts a minimal in-process SMTP server, then compares opening a connection
+per message (the old registration path) with the outbox worker's batched
+delivery over one connection. Also checks that transient 4xx rejections are
+retried and that rows claimed by a worker that died are picked up again once
+their lease expires.
+
+    python -m benchmarks.email_outbox --messages 2000 --batch-size 100
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socketserver
+import tempfile
+import threading
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+parser.add_argument("--messages", type=int, default=2000)
+parser.add_argument("--batch-size", type=int, default=100)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+os.environ["EMAIL_FROM"] = "library@example.com"
+
+from sqlalchemy import insert, func, select  # noqa: E402
+from app import models, outbox  # noqa: E402
+from app.database import Base, async_engine, engine  # noqa: E402
+
+logging.getLogger().setLevel(logging.CRITICAL)
+
+
+class StandInSMTP(socketserver.ThreadingTCPServer):
+    """Just enough SMTP for smtplib: no TLS, no auth, optional 451 on first RCPT."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.defer_first_attempt = False
+        self.deferred = set()
+        self.reset()
+
+    def reset(self):
+        self.connections = 0
+        self.messages = 0
+        self.deferred.clear()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 stand-in ESMTP")
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif verb == "RCPT":
+                with server.lock:
+                    defer = server.defer_first_attempt and command not in server.deferred
+                    server.deferred.add(command)
+                self.reply("451 try again later" if defer else "250 OK")
+            elif verb == "DATA":
+                self.reply("354 end with .")
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                with server.lock:
+                    server.messages += 1
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:  # MAIL, RSET, NOOP
+                self.reply("250 OK")
+
+
+smtp = StandInSMTP()
+threading.Thread(target=smtp.serve_forever, daemon=True).start()
+host, port = smtp.server_address
+
+
+def transport():
+    return outbox.SMTPTransport(host, port, None, None, use_tls=False)
+
+
+def enqueue(count):
+    now = outbox.utcnow()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.EmailOutbox), [{
+            "recipient": f"reader{i}@example.com", "subject": "Welcome", "body": f"Hello reader{i}",
+            "status": outbox.PENDING, "attempts": 0, "next_attempt_at": now, "created_at": now,
+        } for i in range(count)])
+
+
+def backlog():
+    with engine.connect() as conn:
+        return dict(conn.execute(
+            select(models.EmailOutbox.status, func.count()).group_by(models.EmailOutbox.status)
+        ).all())
+
+
+def worker(**kwargs):
+    options = {"transport_factory": transport, "batch_size": args.batch_size, "backoff": 0.0, "lease": 300.0}
+    options.update(kwargs)
+    return outbox.OutboxWorker(**options)
+
+
+async def drain(outbox_worker):
+    while await outbox_worker.run_batch():
+        pass
+
+
+def run(coro):
+    """asyncio.run, closing the pooled connections before their event loop goes away."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(main())
+
+
+def per_message():
+    smtp.reset()
+    start = time.perf_counter()
+    for i in range(args.messages):
+        connection = transport()
+        connection.send("library@example.com", f"reader{i}@example.com", "Welcome", f"Hello reader{i}")
+        connection.close()
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "messages_per_s": round(args.messages / elapsed), "connections": smtp.connections}
+
+
+def batched():
+    enqueue(args.messages)
+    smtp.reset()
+    start = time.perf_counter()
+    run(drain(worker()))
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "messages_per_s": round(args.messages / elapsed),
+            "connections": smtp.connections, "delivered": smtp.messages, "backlog": backlog()}
+
+
+def transient_failures():
+    count = min(args.messages, 200)
+    enqueue(count)
+    smtp.reset()
+    smtp.defer_first_attempt = True
+    outbox_worker = worker()
+
+    async def retry():
+        # Each row is deferred once, rescheduled with zero backoff, then accepted.
+        while backlog().get(outbox.PENDING):
+            await drain(outbox_worker)
+
+    try:
+        run(retry())
+    finally:
+        smtp.defer_first_attempt = False
+    return {"messages": count, "delivered": smtp.messages, **outbox_worker.stats(), "backlog": backlog()}
+
+
+def restart_after_crash():
+    count = min(args.messages, 200)
+    enqueue(count)
+    smtp.reset()
+
+    async def crash():
+        crashed = worker(lease=0.2, batch_size=count)
+        claimed = await crashed._claim()  # claimed, then the process "dies" before sending
+        skipped = await worker(lease=0.2).run_batch()  # leased rows are not visible to others
+        await asyncio.sleep(0.3)
+        await drain(worker())
+        return len(claimed), skipped
+
+    claimed, skipped = run(crash())
+    return {"claimed_then_lost": claimed, "visible_during_lease": skipped, "delivered": smtp.messages, "backlog": backlog()}
+
+
+report = {
+    "messages": args.messages,
+    "batch_size": args.batch_size,
+    "connection_per_message": per_message(),
+    "outbox_batched": batched(),
+    "transient_failures": transient_failures(),
+    "restart_after_crash": restart_after_crash(),
+}
+smtp.shutdown()
+print(json.dumps(report, indent=2))
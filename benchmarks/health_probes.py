@@ -0,0 +1,94 @@
+"""Readiness probes while every pooled connection is busy.
+
+Checks out the whole request pool, as a burst of slow queries would, then
+fires a flood of concurrent probes. The old probe ran ``SELECT 1`` through a
+pooled session, so it queued behind real traffic until ``pool_timeout``; the
+readiness probe uses its own connection and shares one check per window.
+
+    python -m benchmarks.health_probes --probes 500
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--probes", type=int, default=500)
+parser.add_argument("--pool-size", type=int, default=2)
+parser.add_argument("--pool-timeout", type=float, default=1.0)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+os.environ["DB_POOL_SIZE"] = str(args.pool_size)
+os.environ["DB_MAX_OVERFLOW"] = "0"
+os.environ["DB_POOL_TIMEOUT_SECONDS"] = str(args.pool_timeout)
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import AsyncSessionLocal, async_engine  # noqa: E402
+from app.health import readiness_probe  # noqa: E402
+
+logging.getLogger().setLevel(logging.CRITICAL)
+
+
+async def timed(call):
+    start = time.perf_counter()
+    try:
+        await call()
+        ok = True
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def summary(results):
+    latencies = sorted(latency for _, latency in results)
+    return {
+        "succeeded": sum(ok for ok, _ in results),
+        "failed": sum(not ok for ok, _ in results),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+async def main():
+    busy = [await async_engine.connect() for _ in range(args.pool_size)]
+    report = {"pool": async_engine.pool.stats()}
+
+    async def pooled_select():
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+
+    # A handful is enough: each waits out the pool timeout.
+    report["session_select_1"] = summary(await asyncio.gather(*(timed(pooled_select) for _ in range(10))))
+
+    checkouts = async_engine.pool.checkouts
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://probes") as client:
+        async def probe():
+            response = await client.get("/health/ready")
+            response.raise_for_status()
+
+        report["health_ready"] = {
+            **summary(await asyncio.gather(*(timed(probe) for _ in range(args.probes)))),
+            "database_checks": readiness_probe.checks,
+            "request_pool_checkouts": async_engine.pool.checkouts - checkouts,
+        }
+
+    for conn in busy:
+        await conn.close()
+    await async_engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
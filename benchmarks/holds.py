@@ -0,0 +1,165 @@
+"""Readers waiting for lent-out books: polling ``GET /books/{id}`` vs holds and ``/holds/events``.
+
+Starts a uvicorn worker, lends out one copy each of ``--readers`` books and
+has one reader wait for each. In ``poll`` mode readers re-read the book every
+``--poll-interval`` seconds until a copy shows up, as clients did before
+holds existed; in ``holds`` mode they place a hold and listen for
+``hold_ready``. After ``--wait`` seconds every book is returned. Reports the
+requests the readers sent, how long after its return each reader found out,
+and how many got their copy.
+
+    python -m benchmarks.holds --readers 50 --wait 5
+    python -m benchmarks.holds --url postgresql://user:pw@localhost/db
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="sync database URL for both runs (defaults to a temporary SQLite file each)")
+parser.add_argument("--readers", type=int, default=50)
+parser.add_argument("--wait", type=float, default=5.0)
+parser.add_argument("--poll-interval", type=float, default=0.5)
+parser.add_argument("--timeout", type=float, default=60.0)
+args = parser.parse_args()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+tmpdir = tempfile.mkdtemp()
+# Each run seeds its database afresh; this URL only satisfies the settings imported here.
+os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'unused.db')}"
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from app import models  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.utils import create_access_token, utcnow  # noqa: E402
+
+LENDER = 0
+
+
+def seed(url: str):
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    now = utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": i + 1, "username": f"reader{i}", "email": f"reader{i}@example.com", "password": "-", "is_active": True, "is_admin": False}
+            for i in range(args.readers + 1)
+        ])
+        conn.execute(insert(models.Book), [
+            {"id": i + 1, "title": f"Wanted {i}", "author": "Bench", "isbn": f"978{i:010d}", "total_copies": 1, "available_copies": 0}
+            for i in range(args.readers)
+        ])
+        conn.execute(insert(models.BorrowedBook), [
+            {"user_id": LENDER + 1, "book_id": i + 1, "borrow_date": now, "due_date": now + datetime.timedelta(days=14)}
+            for i in range(args.readers)
+        ])
+    engine.dispose()
+
+
+def headers(reader: int) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"sub": f"reader{reader}"})}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(base_url: str):
+    deadline = time.perf_counter() + args.timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/health/live")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise SystemExit("worker did not start")
+
+
+async def poll(client, reader: int, book_id: int, stats: dict) -> float:
+    while True:
+        stats["requests"] += 1
+        book = (await client.get(f"/books/{book_id}")).json()
+        if book["available_copies"] > 0:
+            return time.perf_counter()
+        await asyncio.sleep(args.poll_interval)
+
+
+async def listen(client, reader: int, book_id: int, stats: dict) -> float:
+    stats["requests"] += 1
+    (await client.post(f"/holds/{book_id}", headers=headers(reader))).raise_for_status()
+    stats["requests"] += 1
+    async with client.stream("GET", "/holds/events", headers=headers(reader)) as stream:
+        async for line in stream.aiter_lines():
+            if line.startswith("data:") and json.loads(line[5:])["book_id"] == book_id:
+                return time.perf_counter()
+
+
+async def run(mode: str) -> dict:
+    url = args.url or f"sqlite:///{os.path.join(tmpdir, f'{mode}.db')}"
+    seed(url)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, "DATABASE_URL": url, "PYTHONWARNINGS": "ignore"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        await wait_until_up(base_url)
+        limits = httpx.Limits(max_connections=args.readers * 2 + 10)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            stats = {"requests": 0}
+            returned_at = {}
+            waiter = poll if mode == "poll" else listen
+
+            async def reader(i: int):
+                book_id = i
+                found_at = await waiter(client, i, book_id, stats)
+                stats["requests"] += 1
+                borrowed = (await client.post(f"/borrow/{book_id}", headers=headers(i))).status_code == 200
+                return found_at - returned_at[book_id], borrowed
+
+            readers = [asyncio.create_task(reader(i)) for i in range(1, args.readers + 1)]
+            await asyncio.sleep(args.wait)
+            for book_id in range(1, args.readers + 1):
+                returned_at[book_id] = time.perf_counter()
+                (await client.post(f"/return/{book_id}", headers=headers(LENDER))).raise_for_status()
+            results = await asyncio.gather(*readers)
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    delays = sorted(delay for delay, _ in results)
+    return {
+        "reader_requests": stats["requests"],
+        "borrowed": sum(borrowed for _, borrowed in results),
+        "found_out_p50_ms": round(statistics.median(delays) * 1000, 1),
+        "found_out_max_ms": round(delays[-1] * 1000, 1),
+    }
+
+
+async def main():
+    report = {"readers": args.readers, "wait_seconds": args.wait, "poll_interval": args.poll_interval}
+    for mode in ("poll", "holds"):
+        report[mode] = await run(mode)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,434 @@
+"""Per-endpoint throughput and latency percentiles across every router.
+
+Seeds a synthetic dataset with ``benchmarks.datagen``, then drives each
+endpoint in turn with ``--concurrency`` concurrent clients, and finally all
+read endpoints at once. Requests go through the ASGI app in-process, or to a
+running server with ``--base-url`` (seed the same database with ``--url``).
+The JSON report records the commit, dataset and settings it was taken with.
+``--compare`` checks it against an earlier report and exits 1 when an
+endpoint's p95 or throughput moved past ``--tolerance``.
+
+    python -m benchmarks.load --users 10000 --books 100000 --loans 1000000 --output base.json
+    python -m benchmarks.load --url postgresql://user:pw@localhost/db --base-url http://localhost:8000
+    python -m benchmarks.load --compare base.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+parser.add_argument("--skip-seed", action="store_true", help="reuse the data already in --url")
+parser.add_argument("--users", type=int, default=2_000)
+parser.add_argument("--books", type=int, default=20_000)
+parser.add_argument("--loans", type=int, default=200_000)
+parser.add_argument("--active-ratio", type=float, default=0.05)
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+parser.add_argument("--concurrency", type=int, default=16)
+parser.add_argument("--only", help="run only endpoints whose name contains this text")
+parser.add_argument("--output", help="also write the report to this file")
+parser.add_argument("--compare", help="earlier report to check for regressions")
+parser.add_argument("--tolerance", type=float, default=0.2)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("LOG_FILE", os.path.join(tmpdir, "bench.log"))
+os.environ.setdefault("EMAIL_BACKEND", "console")
+# Every simulated user logs in from the same address here.
+os.environ.setdefault("LOGIN_RATE_IP_BURST", "1000000000")
+
+import logging  # noqa: E402
+import httpx  # noqa: E402
+import sqlalchemy  # noqa: E402
+from app.main import app  # noqa: E402
+from app import utils  # noqa: E402
+from app.database import async_engine, engine  # noqa: E402
+from app.pagination import encode_cursor  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+class Scenario(NamedTuple):
+    name: str
+    call: Callable[[httpx.AsyncClient, int, random.Random], Awaitable[httpx.Response]]
+    expected: frozenset = frozenset({200})
+    read: bool = True
+    count: Callable[[], int] = lambda: args.requests
+    # Run once before the scenario, outside its timings.
+    setup: Optional[Callable[[httpx.AsyncClient], Awaitable[None]]] = None
+
+
+class State:
+    """Ids handed from one write scenario to the next (create -> update -> delete, borrow -> return, hold -> cancel)."""
+
+    def __init__(self):
+        self.headers = {}
+        self.created_books = []
+        self.loans = []
+        self.batches = []
+        self.wanted_books = []
+        self.holds = []
+        self.ready_holders = []
+        self.sequence = itertools.count(1)
+
+    def auth(self, user_id: int) -> dict:
+        if user_id not in self.headers:
+            token = utils.create_access_token({"sub": f"user{user_id}"})
+            self.headers[user_id] = {"Authorization": f"Bearer {token}"}
+        return self.headers[user_id]
+
+
+state = State()
+ADMIN = 1
+OK_OR_CONFLICT = frozenset({200, 400})
+# Readers queued on each lent-out book the hold scenarios create.
+HOLDERS_PER_BOOK = 20
+
+
+def any_user(rng):
+    return rng.randint(1, args.users)
+
+
+def borrower(rng):
+    # datagen hands active loans to users 1..active round-robin, so these users have some.
+    return rng.randint(1, max(1, min(args.users, int(args.loans * args.active_ratio))))
+
+
+def book_payload(n, copies=3):
+    return {"title": f"Load test {n}", "author": "Load", "published_date": "2001-01-01",
+            "isbn": f"979{n:010d}", "total_copies": copies}
+
+
+async def create_book(client, i, rng):
+    response = await client.post("/books/", json=book_payload(next(state.sequence)), headers=state.auth(ADMIN))
+    if response.status_code == 201:
+        state.created_books.append(response.json()["id"])
+    return response
+
+
+async def borrow(client, i, rng):
+    user_id, book_id = any_user(rng), rng.randint(1, args.books)
+    response = await client.post(f"/borrow/{book_id}", headers=state.auth(user_id))
+    if response.status_code == 200:
+        state.loans.append((user_id, book_id))
+    return response
+
+
+async def borrow_batch(client, i, rng):
+    user_id, book_ids = any_user(rng), rng.sample(range(1, args.books + 1), 10)
+    response = await client.post("/borrow/batch", json={"book_ids": book_ids}, headers=state.auth(user_id))
+    if response.status_code == 200:
+        state.batches.append((user_id, [item["book_id"] for item in response.json()["results"] if item["status"] == "borrowed"]))
+    return response
+
+
+async def lend_out_books(client):
+    """Books whose only copy the admin has borrowed, so holds can be placed on them."""
+    for _ in range(math.ceil(args.requests / holders_per_book())):
+        response = await client.post("/books/", json=book_payload(next(state.sequence), copies=1), headers=state.auth(ADMIN))
+        book_id = response.json()["id"]
+        await client.post(f"/borrow/{book_id}", headers=state.auth(ADMIN))
+        state.wanted_books.append(book_id)
+
+
+def holders_per_book():
+    # Anyone but the admin, who holds the copy.
+    return max(1, min(HOLDERS_PER_BOOK, args.users - 1))
+
+
+async def place_hold(client, i, rng):
+    user_id = 2 + i % holders_per_book()
+    book_id = state.wanted_books[i // holders_per_book()]
+    response = await client.post(f"/holds/{book_id}", headers=state.auth(user_id))
+    if response.status_code == 201:
+        state.holds.append((user_id, book_id))
+    return response
+
+
+async def return_wanted_books(client):
+    # Each return sets the copy aside for the first reader in line, who has an event waiting then.
+    for book_id in state.wanted_books:
+        await client.post(f"/return/{book_id}", headers=state.auth(ADMIN))
+    for user_id in sorted({user_id for user_id, _ in state.holds}):
+        response = await client.get("/holds", headers=state.auth(user_id))
+        state.ready_holders.extend(user_id for hold in response.json() if hold["status"] == "ready")
+
+
+async def first_event(client, path, headers):
+    """GET a server-sent event stream and hang up after its first event.
+
+    The stream never ends on its own, and ASGITransport only returns once the
+    app has, so in-process the request is sent to the app directly.
+    """
+    if args.base_url:
+        async with client.stream("GET", path, headers=headers) as response:
+            async for line in response.aiter_lines():
+                if not line:
+                    break
+        return response
+
+    status_code, body, received = None, [], asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+            if b"\n\n" in b"".join(body) or not message.get("more_body", False):
+                received.set()
+
+    responding = asyncio.ensure_future(app({
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench")] + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }, receive, send))
+    waiting = asyncio.ensure_future(received.wait())
+    await asyncio.wait({responding, waiting}, return_when=asyncio.FIRST_COMPLETED)
+    if responding.done():
+        responding.result()
+    # The endpoint only notices a hang-up at its next keepalive, so stop it here.
+    for task in (responding, waiting):
+        task.cancel()
+    await asyncio.gather(responding, waiting, return_exceptions=True)
+    return httpx.Response(status_code, content=b"".join(body))
+
+
+async def register(client, i, rng):
+    n = next(state.sequence)
+    return await client.post("/auth/register", json={
+        "username": f"load{n}-{args.seed}", "email": f"load{n}-{args.seed}@example.com", "password": "benchmark"
+    })
+
+
+SCENARIOS = [
+    # probes
+    Scenario("GET /health/live", lambda c, i, rng: c.get("/health/live")),
+    Scenario("GET /health/ready", lambda c, i, rng: c.get("/health/ready")),
+    # auth
+    Scenario("GET /auth/users/me", lambda c, i, rng: c.get("/auth/users/me", headers=state.auth(any_user(rng)))),
+    Scenario("POST /auth/token/refresh", lambda c, i, rng: c.post("/auth/token/refresh", headers=state.auth(any_user(rng))), read=False),
+    # bcrypt-bound, so a tenth of the requests
+    Scenario("POST /auth/login", lambda c, i, rng: c.post("/auth/login", data={"username": f"user{any_user(rng)}", "password": datagen.PASSWORD}),
+             read=False, count=lambda: max(args.requests // 10, 1)),
+    Scenario("POST /auth/register", register, read=False, count=lambda: max(args.requests // 10, 1)),
+    # books
+    Scenario("GET /books/", lambda c, i, rng: c.get("/books/", params={"skip": rng.randrange(0, 1000), "limit": 20})),
+    Scenario("GET /books/?cursor", lambda c, i, rng: c.get("/books/", params={"cursor": encode_cursor(rng.randrange(args.books)), "limit": 20})),
+    Scenario("GET /books/?q", lambda c, i, rng: c.get("/books/", params={"q": f"Author {rng.randrange(5000)}", "limit": 20})),
+    Scenario("GET /books/{id}", lambda c, i, rng: c.get(f"/books/{rng.randint(1, args.books)}")),
+    Scenario("POST /books/", create_book, expected=frozenset({201}), read=False),
+    Scenario("PUT /books/{id}", lambda c, i, rng: c.put(
+        f"/books/{state.created_books[i]}", json=book_payload(next(state.sequence), copies=4), headers=state.auth(ADMIN)
+    ), read=False, count=lambda: len(state.created_books)),
+    Scenario("DELETE /books/{id}", lambda c, i, rng: c.delete(f"/books/{state.created_books[i]}", headers=state.auth(ADMIN)),
+             expected=frozenset({204}), read=False, count=lambda: len(state.created_books)),
+    # borrowing
+    Scenario("POST /borrow/{id}", borrow, expected=OK_OR_CONFLICT, read=False),
+    Scenario("POST /return/{id}", lambda c, i, rng: c.post(f"/return/{state.loans[i][1]}", headers=state.auth(state.loans[i][0])),
+             read=False, count=lambda: len(state.loans)),
+    Scenario("POST /borrow/batch", borrow_batch, read=False),
+    Scenario("POST /return/batch", lambda c, i, rng: c.post(
+        "/return/batch", json={"book_ids": state.batches[i][1] or [1]}, headers=state.auth(state.batches[i][0])
+    ), read=False, count=lambda: len(state.batches)),
+    Scenario("GET /borrowed", lambda c, i, rng: c.get("/borrowed", params={"limit": 20}, headers=state.auth(borrower(rng)))),
+    Scenario("GET /borrowed/details", lambda c, i, rng: c.get("/borrowed/details", headers=state.auth(borrower(rng)))),
+    # holds
+    Scenario("POST /holds/{id}", place_hold, expected=frozenset({201}), read=False, setup=lend_out_books),
+    Scenario("GET /holds", lambda c, i, rng: c.get("/holds", headers=state.auth(rng.choice(state.holds)[0] if state.holds else any_user(rng)))),
+    # Only readers with a copy set aside get an event straight away; the rest would wait for a keepalive.
+    Scenario("GET /holds/events", lambda c, i, rng: first_event(
+        c, "/holds/events", state.auth(state.ready_holders[i % len(state.ready_holders)])
+    ), read=False, count=lambda: args.requests if state.ready_holders else 0, setup=return_wanted_books),
+    Scenario("DELETE /holds/{id}", lambda c, i, rng: c.delete(f"/holds/{state.holds[i][1]}", headers=state.auth(state.holds[i][0])),
+             expected=frozenset({204}), read=False, count=lambda: len(state.holds)),
+    # admin
+    Scenario("GET /admin/users", lambda c, i, rng: c.get("/admin/users", params={"skip": rng.randrange(0, args.users)}, headers=state.auth(ADMIN))),
+    Scenario("GET /admin/borrowing-history", lambda c, i, rng: c.get("/admin/borrowing-history", params={"limit": 50}, headers=state.auth(ADMIN))),
+    Scenario("GET /admin/borrowing-history?user_id", lambda c, i, rng: c.get(
+        "/admin/borrowing-history", params={"user_id": any_user(rng), "limit": 50}, headers=state.auth(ADMIN)
+    )),
+    Scenario("GET /admin/borrowing-history?overdue_only", lambda c, i, rng: c.get(
+        "/admin/borrowing-history", params={"overdue_only": "true", "limit": 50}, headers=state.auth(ADMIN)
+    )),
+    Scenario("GET /admin/borrowing-history/export", lambda c, i, rng: c.get(
+        "/admin/borrowing-history/export", params={"user_id": any_user(rng)}, headers=state.auth(ADMIN)
+    )),
+    Scenario("GET /admin/analytics/books", lambda c, i, rng: c.get(
+        "/admin/analytics/books", params={"order": rng.choice(["total_loans", "active_loans"])}, headers=state.auth(ADMIN)
+    )),
+    Scenario("GET /admin/analytics/books/{id}", lambda c, i, rng: c.get(
+        f"/admin/analytics/books/{rng.randint(1, args.books)}", headers=state.auth(ADMIN)
+    )),
+    Scenario("GET /admin/analytics/daily", lambda c, i, rng: c.get(
+        "/admin/analytics/daily", params={"start_date": "2025-12-01", "end_date": "2025-12-31"}, headers=state.auth(ADMIN)
+    )),
+]
+
+
+def percentile(ordered, q):
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(latencies, statuses, unexpected, elapsed):
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"requests": 0}
+    return {
+        "requests": len(ordered),
+        "errors": unexpected,
+        "throughput_rps": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(ordered, 0.90) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def drive(client, work):
+    """Run ``(scenario, index, rng)`` items with ``--concurrency`` workers; stats per scenario name."""
+    results = {}
+    queue = iter(work)
+
+    async def worker():
+        for scenario, i, rng in queue:
+            latencies, statuses, unexpected = results.setdefault(scenario.name, ([], Counter(), [0]))
+            start = time.perf_counter()
+            response = await scenario.call(client, i, rng)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            if response.status_code not in scenario.expected:
+                unexpected[0] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return results, time.perf_counter() - start
+
+
+async def run(scenarios):
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    report = {}
+    async with client:
+        for scenario in scenarios:
+            rng = random.Random(f"{args.seed}:{scenario.name}")
+            if scenario.setup:
+                await scenario.setup(client)
+            results, elapsed = await drive(client, ((scenario, i, rng) for i in range(scenario.count())))
+            if scenario.name in results:
+                report[scenario.name] = summarize(*results[scenario.name][:2], results[scenario.name][2][0], elapsed)
+
+        reads = [scenario for scenario in scenarios if scenario.read]
+        rng = random.Random(f"{args.seed}:mixed")
+        work = [(scenario, i, rng) for scenario in reads for i in range(scenario.count())]
+        rng.shuffle(work)
+        results, elapsed = await drive(client, work)
+        latencies = [latency for values, _, _ in results.values() for latency in values]
+        statuses = sum((counts for _, counts, _ in results.values()), Counter())
+        errors = sum(unexpected[0] for _, _, unexpected in results.values())
+        if latencies:
+            report["mixed reads"] = summarize(latencies, statuses, errors, elapsed)
+    # No lifespan under ASGITransport, so close the pooled connections here.
+    await async_engine.dispose()
+    return report
+
+
+def git(*command):
+    try:
+        return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """Endpoints whose p95 grew or throughput fell by more than ``--tolerance``."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    for key in ("dataset", "concurrency", "requests_per_endpoint", "only", "target"):
+        if baseline["meta"].get(key) != report["meta"].get(key):
+            print(f"warning: baseline was taken with a different {key}", file=sys.stderr)
+    regressions = {}
+    for name, current in report["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before or not before.get("requests") or not current.get("requests"):
+            continue
+        p95_change = current["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps_change = current["throughput_rps"] / before["throughput_rps"] - 1
+        print(f"{name:45} p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}", file=sys.stderr)
+        if p95_change > args.tolerance or rps_change < -args.tolerance:
+            regressions[name] = {"p95_change": round(p95_change, 3), "throughput_change": round(rps_change, 3)}
+    return {"baseline": baseline["meta"].get("commit"), "tolerance": args.tolerance, "regressions": regressions}
+
+
+def main():
+    dataset = {"users": args.users, "books": args.books, "loans": args.loans,
+               "active_ratio": args.active_ratio, "seed": args.seed}
+    seeding = None
+    if not args.skip_seed:
+        seeding = datagen.seed(engine, args.users, args.books, args.loans, args.active_ratio, args.seed)
+
+    scenarios = [scenario for scenario in SCENARIOS if not args.only or args.only in scenario.name]
+    endpoints = asyncio.run(run(scenarios))
+
+    report = {
+        "meta": {
+            "commit": git("rev-parse", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": engine.dialect.name,
+            "target": args.base_url or "in-process",
+            "dataset": dataset,
+            "requests_per_endpoint": args.requests,
+            "concurrency": args.concurrency,
+            "only": args.only,
+        },
+        "seeding": seeding,
+        "endpoints": endpoints,
+    }
+    if args.compare:
+        report["comparison"] = compare(report, args.compare)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if args.compare and report["comparison"]["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""A password-guessing burst against one account, with and without the login limiter.
+
+Fires ``--attempts`` concurrent wrong-password logins for one username from
+one address while a legitimate client keeps listing books, and reports how
+many bcrypt verifications ran, how many attempts were turned away and what
+the bystander's requests cost meanwhile.
+
+    python -m benchmarks.login_throttle --attempts 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--attempts", type=int, default=200)
+parser.add_argument("--bystander-requests", type=int, default=50)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app.main import app  # noqa: E402
+from app import models, utils  # noqa: E402
+from app.database import Base, async_engine, engine  # noqa: E402
+from app.routers import auth  # noqa: E402
+
+logging.getLogger().setLevel(logging.CRITICAL)
+
+
+def seed():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{
+            "username": "victim", "email": "victim@example.com",
+            "password": utils.get_password_hash("correct horse"), "is_active": True, "is_admin": False,
+        }])
+        conn.execute(insert(models.Book), [
+            {"title": f"Book {i}", "author": "Bench", "isbn": f"978{i:010d}", "total_copies": 1, "available_copies": 1}
+            for i in range(50)
+        ])
+
+
+async def burst(client, limited: bool):
+    for limiter in (auth.login_ip_limiter, auth.login_username_limiter):
+        limiter._buckets.clear()
+    saved = auth.login_ip_limiter.capacity, auth.login_username_limiter.capacity
+    if not limited:
+        auth.login_ip_limiter.capacity = auth.login_username_limiter.capacity = args.attempts * 2
+    verified = utils.password_pool.completed_total
+
+    async def guess(i):
+        try:
+            return str((await client.post("/auth/login", data={"username": "victim", "password": f"guess{i}"})).status_code)
+        except Exception as exc:
+            return type(exc).__name__
+
+    async def bystander():
+        latencies, failures = [], 0
+        for _ in range(args.bystander_requests):
+            start = time.perf_counter()
+            try:
+                (await client.get("/books/", params={"limit": 20})).raise_for_status()
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+        return latencies, failures
+
+    start = time.perf_counter()
+    statuses, (latencies, failures) = await asyncio.gather(asyncio.gather(*(guess(i) for i in range(args.attempts))), bystander())
+    elapsed = time.perf_counter() - start
+    auth.login_ip_limiter.capacity, auth.login_username_limiter.capacity = saved
+    return {
+        "seconds": round(elapsed, 3),
+        "bcrypt_verifications": utils.password_pool.completed_total - verified,
+        "responses": {code: statuses.count(code) for code in sorted(set(statuses))},
+        "bystander_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "bystander_max_ms": round(max(latencies) * 1000, 2),
+        "bystander_failures": failures,
+    }
+
+
+async def main():
+    seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        report = {
+            "attempts": args.attempts,
+            "without_limiter": await burst(client, limited=False),
+            "with_limiter": await burst(client, limited=True),
+            "limiter": auth.login_limiter_stats(),
+        }
+    await async_engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""Page latency of offset vs keyset pagination over borrowed_books.
+
+Seeds a throwaway database with loans and times fetching page 1 and a deep
+page (10,000 by default) with ``offset(skip)`` and with the ``(borrow_date,
+id)`` cursor the history and /borrowed endpoints use.
+
+    python -m benchmarks.pagination --loans 300000 --page 10000
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+parser.add_argument("--loans", type=int, default=300_000)
+parser.add_argument("--limit", type=int, default=20)
+parser.add_argument("--page", type=int, default=10_000)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault("DATABASE_URL", url)
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from sqlalchemy import create_engine, insert, select, tuple_  # noqa: E402
+from app import models  # noqa: E402
+from app.database import Base  # noqa: E402
+
+engine = create_engine(url)
+Loan = models.BorrowedBook
+
+
+def seed():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    start = datetime.datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": 1, "username": "bench", "email": "bench@example.com"}])
+        conn.execute(insert(models.Book), [{"id": 1, "title": "Bench", "author": "Bench", "isbn": "9780000000000"}])
+        batch = []
+        for i in range(args.loans):
+            borrow_date = start + datetime.timedelta(minutes=i // 3)
+            # Returned, so uq_borrowed_books_active_loan allows them all for one user and book.
+            batch.append({"user_id": 1, "book_id": 1, "borrow_date": borrow_date,
+                          "return_date": borrow_date + datetime.timedelta(days=1)})
+            if len(batch) == 10_000:
+                conn.execute(insert(Loan), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Loan), batch)
+
+
+def ordered():
+    return select(Loan).order_by(Loan.borrow_date.desc(), Loan.id.desc())
+
+
+def timed(stmt) -> float:
+    samples = []
+    for _ in range(args.repeat):
+        with engine.connect() as conn:
+            begin = time.perf_counter()
+            conn.execute(stmt).all()
+            samples.append(time.perf_counter() - begin)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+def main():
+    seed()
+    deep_offset = (args.page - 1) * args.limit
+    if deep_offset >= args.loans:
+        raise SystemExit(f"--loans must exceed {deep_offset} to reach page {args.page}")
+
+    with engine.connect() as conn:
+        anchor = conn.execute(ordered().offset(deep_offset - 1).limit(1)).first()
+
+    def after(row):
+        return ordered().filter(tuple_(Loan.borrow_date, Loan.id) < tuple_(row.borrow_date, row.id))
+
+    results = {
+        "offset": {
+            "page_1_ms": timed(ordered().limit(args.limit)),
+            f"page_{args.page}_ms": timed(ordered().offset(deep_offset).limit(args.limit)),
+        },
+        "keyset": {
+            "page_1_ms": timed(ordered().limit(args.limit)),
+            f"page_{args.page}_ms": timed(after(anchor).limit(args.limit)),
+        },
+    }
+    print(json.dumps({"loans": args.loans, "limit": args.limit, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
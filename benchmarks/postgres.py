@@ -0,0 +1,81 @@
+"""Every benchmark that drives the app, run once against PostgreSQL.
+
+SQLite lets through things asyncpg refuses, such as a timezone-aware
+datetime bound to a naive ``DateTime`` column, so a change that only ever
+ran on SQLite can still fail every request on PostgreSQL. This runs each
+script below at a small size against ``--url``, starting each from an empty
+schema, and exits non-zero when a script fails or, for ``load``, when any
+endpoint answered with a status it doesn't expect. Everything in the
+database is dropped.
+
+    python -m benchmarks.postgres --url postgresql://user:pw@localhost/bench
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.engine import make_url
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = {
+    "borrow_contention": ["--borrowers", "100", "--copies", "10"],
+    "statement_counts": ["--loans", "30"],
+    "pagination": ["--loans", "5000", "--page", "100", "--repeat", "1"],
+    "bulk_import": ["--rows", "2000"],
+    "email_outbox": ["--messages", "200"],
+    "cold_start": ["--repeat", "1"],
+    "holds": ["--readers", "20", "--wait", "2"],
+    "load": ["--users", "100", "--books", "500", "--loans", "2000", "--requests", "20"],
+}
+
+
+def reset(url: str):
+    engine = create_engine(url)
+    metadata = MetaData()
+    # Reflected rather than app.models, so alembic_version and tables of older revisions go too.
+    metadata.reflect(engine)
+    metadata.drop_all(engine)
+    engine.dispose()
+
+
+def unexpected_statuses(output: str) -> dict:
+    endpoints = json.loads(output)["endpoints"]
+    return {name: stats["errors"] for name, stats in endpoints.items() if stats.get("errors")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True, help="sync PostgreSQL URL; its database is emptied")
+    parser.add_argument("--only", help="run only scripts whose name contains this text")
+    args = parser.parse_args()
+    if make_url(args.url).get_backend_name() != "postgresql":
+        parser.error("--url must point at PostgreSQL")
+
+    report, failures = {}, []
+    for name, script_args in SCRIPTS.items():
+        if args.only and args.only not in name:
+            continue
+        reset(args.url)
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-m", f"benchmarks.{name}", "--url", args.url, *script_args],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        report[name] = {"exit_code": result.returncode, "seconds": round(time.perf_counter() - start, 1)}
+        if result.returncode != 0:
+            failures.append(name)
+            print(f"--- {name} ---\n{result.stderr[-4000:]}", file=sys.stderr)
+        elif name == "load" and unexpected_statuses(result.stdout):
+            report[name]["unexpected_statuses"] = unexpected_statuses(result.stdout)
+            failures.append(name)
+    print(json.dumps({"scripts": report, "failures": failures}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Query-plan regression check for the borrowing queries.
+
+Seeds a SQLite database, drives the borrowing, book and admin endpoints
+through the ASGI app, captures every statement that touches borrowed_books
+and runs EXPLAIN QUERY PLAN on it with the same parameters. Exits non-zero
+if a request doesn't answer with its expected status, since a failed one
+may never reach the queries meant to be checked, or if any statement falls
+back to a full table scan of borrowed_books.
+
+    python -m benchmarks.query_plans --loans 50000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import tempfile
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--users", type=int, default=2_000)
+parser.add_argument("--books", type=int, default=5_000)
+parser.add_argument("--loans", type=int, default=50_000)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+db_path = os.path.join(tmpdir, "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "plans.log")
+
+import httpx  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+from app.main import app  # noqa: E402
+from app import models, utils  # noqa: E402
+from app.database import Base, async_engine, engine  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+FULL_SCAN = re.compile(r"\bSCAN borrowed_books(_\d+)?\b(?! USING (COVERING )?INDEX)")
+
+
+def seed():
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    start = datetime.datetime(2023, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "-",
+             "is_active": True, "is_admin": i == 1}
+            for i in range(1, args.users + 1)
+        ])
+        conn.execute(insert(models.Book), [
+            {"id": i, "title": f"Title {i}", "author": f"Author {i % 300}", "isbn": f"978{i:010d}",
+             "total_copies": 5, "available_copies": 5}
+            for i in range(1, args.books + 1)
+        ])
+        loans = []
+        for i in range(args.loans):
+            borrowed = start + datetime.timedelta(minutes=i * 7)
+            returned = borrowed + datetime.timedelta(days=rng.randint(1, 30)) if rng.random() < 0.9 else None
+            loans.append({"user_id": rng.randint(2, args.users), "book_id": rng.randint(2, args.books),
+                          "borrow_date": borrowed, "return_date": returned,
+                          "due_date": borrowed + datetime.timedelta(days=14)})
+        # An open loan on book 2 at any --loans, so deleting it must be refused.
+        loans.append({"user_id": 3, "book_id": 2, "borrow_date": start, "return_date": None,
+                      "due_date": start + datetime.timedelta(days=14)})
+        conn.execute(insert(models.BorrowedBook), loans)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("ANALYZE")
+
+
+async def drive():
+    admin = {"Authorization": f"Bearer {utils.create_access_token({'sub': 'user1'})}"}
+    reader = {"Authorization": f"Bearer {utils.create_access_token({'sub': 'user2'})}"}
+    requests = [
+        ("POST", "/borrow/1", reader, 200),
+        # Already borrowed: the conflict path.
+        ("POST", "/borrow/1", reader, 400),
+        ("GET", "/borrowed", reader, 200),
+        ("GET", "/borrowed?limit=20", reader, 200),
+        ("GET", "/borrowed/details", reader, 200),
+        ("POST", "/return/1", reader, 200),
+        # Book 2 has an open loan; book 1 has none left once returned above.
+        ("DELETE", "/books/2", admin, 400),
+        ("GET", "/admin/users?limit=100", admin, 200),
+        ("GET", "/admin/borrowing-history", admin, 200),
+        ("GET", "/admin/borrowing-history?user_id=2", admin, 200),
+        ("GET", "/admin/borrowing-history?book_id=2", admin, 200),
+        ("GET", "/admin/borrowing-history?active_only=true", admin, 200),
+        ("GET", "/admin/borrowing-history?overdue_only=true", admin, 200),
+        ("GET", "/admin/borrowing-history/export?user_id=2", admin, 200),
+        ("DELETE", "/books/1", admin, 204),
+    ]
+    unexpected = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plans") as client:
+        for method, path, headers, expected in requests:
+            response = await client.request(method, path, headers=headers)
+            if response.status_code != expected:
+                unexpected.append({"request": f"{method} {path}", "status": response.status_code,
+                                   "expected": expected, "body": response.text[:200]})
+    # No lifespan under ASGITransport, so close the pooled connections here.
+    await async_engine.dispose()
+    return unexpected
+
+
+def main():
+    seed()
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "borrowed_books" in statement and not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    unexpected = asyncio.run(drive())
+    if unexpected:
+        print(json.dumps({"unexpected_statuses": unexpected}, indent=2))
+        raise SystemExit(1)
+
+    failures = []
+    with sqlite3.connect(db_path) as conn:
+        for statement, parameters in captured:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            if any(FULL_SCAN.search(step) for step in plan):
+                failures.append({"statement": " ".join(statement.split()), "plan": plan})
+
+    print(json.dumps({"statements_checked": len(captured), "full_scans": failures}, indent=2))
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Read-replica routing against local stand-in databases.
+
+The primary and the replica are SQLite files; the replica is a copy opened
+read-only whose book title differs, so every response shows which database
+served it. A second replica URL points at a directory that does not exist.
+Walks through: reads going to the reachable replica while the broken one is
+skipped, reads sticking to the primary after the client's own write, falling
+back to the primary when no replica is reachable, and the replica being used
+again once its retry window has passed. The book endpoints must only ever
+show the primary's title, since what they read goes into the book cache.
+Exits non-zero if any step misroutes.
+
+    python -m benchmarks.replicas
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--retry-seconds", type=float, default=1.0)
+parser.add_argument("--sticky-seconds", type=float, default=1.0)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+primary_path = os.path.join(tmpdir, "primary.db")
+replica_path = os.path.join(tmpdir, "replica.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{primary_path}"
+os.environ["DATABASE_REPLICA_URLS"] = ",".join([
+    f"sqlite:///{os.path.join(tmpdir, 'missing', 'replica.db')}",
+    f"sqlite:///file:{replica_path}?mode=ro&uri=true",
+])
+os.environ["REPLICA_RETRY_SECONDS"] = str(args.retry_seconds)
+os.environ["REPLICA_STICKY_SECONDS"] = str(args.sticky_seconds)
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app.main import app  # noqa: E402
+from app import models, utils  # noqa: E402
+from app.database import Base, async_engine, engine, replicas  # noqa: E402
+
+logging.getLogger().setLevel(logging.CRITICAL)
+
+BOOK = {"title": "Primary title", "author": "Someone", "published_date": None, "isbn": "9780000000001", "total_copies": 1}
+
+
+def seed():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": 1, "username": "admin", "email": "admin@example.com",
+                                            "password": "-", "is_active": True, "is_admin": True}])
+        conn.execute(insert(models.Book), [{"id": 1, "available_copies": 1, **BOOK}])
+    shutil.copyfile(primary_path, replica_path)
+    with sqlite3.connect(replica_path) as conn:
+        conn.execute("UPDATE books SET title = 'Replica title'")
+
+
+async def main():
+    seed()
+    admin = {"Authorization": f"Bearer {utils.create_access_token({'sub': 'admin'})}"}
+    steps, failures = [], []
+
+    async def step(name, client, expected_title, path="/admin/analytics/books/1"):
+        response = await client.get(path, headers=admin)
+        title = response.json().get("title") if response.status_code == 200 else response.status_code
+        steps.append({"step": name, "served_by": title, **replicas.stats()})
+        if title != expected_title:
+            failures.append(name)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replicas") as client:
+        await step("read, broken replica skipped", client, "Replica title")
+        await step("read, broken replica still in its retry window", client, "Replica title")
+        await step("book read, cached from the primary", client, "Primary title", path="/books/1")
+
+        response = await client.put("/books/1", json={**BOOK, "title": "Updated title"}, headers=admin)
+        assert response.status_code == 200, response.text
+        await step("read right after own write", client, "Updated title")
+        async with httpx.AsyncClient(transport=transport, base_url="http://replicas") as other:
+            await step("another client reads meanwhile", other, "Replica title")
+        time.sleep(args.sticky_seconds + 0.1)
+        await step("read once the sticky window passed", client, "Replica title")
+        await step("book read once the sticky window passed", client, "Updated title", path="/books/1")
+
+        os.rename(replica_path, replica_path + ".away")
+        await replicas.engines[1].dispose()
+        await step("read with no replica reachable", client, "Updated title")
+
+        os.rename(replica_path + ".away", replica_path)
+        await step("replica back, still in its retry window", client, "Updated title")
+        time.sleep(args.retry_seconds + 0.1)
+        await step("replica back, retry window passed", client, "Replica title")
+
+    print(json.dumps({"steps": steps, "misrouted": failures}, indent=2))
+    await replicas.dispose()
+    await async_engine.dispose()
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""Serialization cost per 100 rows: response_model path vs column tuples + orjson.
+
+The old path is what FastAPI does for a ``response_model`` endpoint that
+returns ORM objects: validate them into the schema with ``from_attributes``,
+dump to JSON-compatible Python, then encode with the stdlib ``json`` module.
+The fast path zips column tuples into dicts and encodes them with orjson.
+Both outputs are decoded and compared so the payloads are known to match.
+
+    python -m benchmarks.serialization --rows 100 --repeat 2000
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import tempfile
+import timeit
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--rows", type=int, default=100)
+parser.add_argument("--repeat", type=int, default=2000)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+
+from typing import List  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from app import models, schemas  # noqa: E402
+from app.routers.admin import loan_duration  # noqa: E402
+from app.serialization import BOOK_FIELDS, LOAN_FIELDS, USER_FIELDS, dumps, record  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+now = datetime.datetime(2026, 1, 1, 12, 0, 0, 123456)
+users = [models.User(id=i, username=f"reader{i}", email=f"reader{i}@example.com", password="-", is_active=True, is_admin=False) for i in range(args.rows)]
+books = [models.Book(id=i, title=f"Book {i}", author=f"Author {i}", published_date=datetime.date(2000, 1, 1), isbn=f"978{i:010d}", total_copies=3, available_copies=2) for i in range(args.rows)]
+loans = [
+    models.BorrowedBook(id=i, user_id=i, book_id=i, borrow_date=now - datetime.timedelta(days=i % 30),
+                        return_date=None if i % 3 else now, due_date=now + datetime.timedelta(days=14 - i % 30))
+    for i in range(args.rows)
+]
+for loan, user, book in zip(loans, users, books):
+    loan.user, loan.book = user, book
+
+
+def as_tuple(obj, fields):
+    return tuple(getattr(obj, field) for field in fields)
+
+
+loan_rows = [as_tuple(loan, LOAN_FIELDS) for loan in loans]
+user_rows = [as_tuple(user, USER_FIELDS) for user in users]
+book_rows = [as_tuple(book, BOOK_FIELDS) for book in books]
+
+
+def response_model_path(adapter, content):
+    return json.dumps(
+        adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json"),
+        ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode()
+
+
+book_list = TypeAdapter(List[schemas.BookOut])
+details_list = TypeAdapter(List[schemas.BorrowedBookWithDetails])
+history_list = TypeAdapter(List[schemas.BorrowingHistory])
+
+
+def history_before():
+    # What get_borrowing_history did: one schema instance per row, nested models from __dict__.
+    result = []
+    for loan, user, book in zip(loans, users, books):
+        duration, is_overdue = loan_duration(loan.borrow_date, loan.return_date, loan.due_date)
+        result.append(schemas.BorrowingHistory(
+            id=loan.id, user_id=loan.user_id, book_id=loan.book_id,
+            user=schemas.UserOut.model_validate(user.__dict__),
+            book=schemas.BookOut.model_validate(book.__dict__),
+            borrow_date=loan.borrow_date, return_date=loan.return_date, due_date=loan.due_date,
+            duration_days=duration, is_overdue=is_overdue,
+        ))
+    return response_model_path(history_list, result)
+
+
+def history_after():
+    result = []
+    for loan, user, book in zip(loan_rows, user_rows, book_rows):
+        borrowing = record(LOAN_FIELDS, loan)
+        duration, is_overdue = loan_duration(borrowing["borrow_date"], borrowing["return_date"], borrowing["due_date"])
+        result.append({**borrowing, "user": record(USER_FIELDS, user), "book": record(BOOK_FIELDS, book),
+                       "duration_days": duration, "is_overdue": is_overdue})
+    return dumps(result)
+
+
+cases = {
+    "list_books": (
+        lambda: response_model_path(book_list, books),
+        lambda: dumps([record(BOOK_FIELDS, row) for row in book_rows]),
+    ),
+    "borrowed_details": (
+        lambda: response_model_path(details_list, loans),
+        lambda: dumps([{**record(LOAN_FIELDS, loan), "book": record(BOOK_FIELDS, book)} for loan, book in zip(loan_rows, book_rows)]),
+    ),
+    "borrowing_history": (history_before, history_after),
+}
+
+
+def per_100_rows_us(func):
+    seconds = min(timeit.repeat(func, number=args.repeat, repeat=3)) / args.repeat
+    return round(seconds * 1e6 * 100 / args.rows, 1)
+
+
+report = {"rows": args.rows, "repeat": args.repeat, "endpoints": {}}
+for name, (before, after) in cases.items():
+    # duration_days depends on the wall clock, so compare everything else.
+    strip = lambda rows: [{k: v for k, v in row.items() if k != "duration_days"} for row in rows]  # noqa: E731
+    same = strip(json.loads(before())) == strip(json.loads(after()))
+    before_us, after_us = per_100_rows_us(before), per_100_rows_us(after)
+    report["endpoints"][name] = {
+        "response_model_us_per_100_rows": before_us,
+        "orjson_tuples_us_per_100_rows": after_us,
+        "speedup": round(before_us / after_us, 1),
+        "identical_payload": same,
+    }
+print(json.dumps(report, indent=2))
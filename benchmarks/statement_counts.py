@@ -0,0 +1,139 @@
+"""SQL statements per request for the loan-detail endpoints, at growing row counts.
+
+Seeds one reader with ``--loans`` loans (a third still open) and as many
+holds, plus as many users, then requests each endpoint after filling the
+database to 1, 10 and ``--loans`` rows. An endpoint passes when it runs the
+same, expected number of statements at every size, i.e. there is no query
+per row, and when none of its statements reads the password column. Pages
+of different sizes of one endpoint must run as many statements as each
+other, too. Exits non-zero on any failure.
+
+    python -m benchmarks.statement_counts --loans 300
+    python -m benchmarks.statement_counts --url postgresql://user:pw@localhost/db
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sys
+import tempfile
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="sync database URL (defaults to a temporary SQLite file)")
+parser.add_argument("--loans", type=int, default=300)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["LOG_FILE"] = os.path.join(tmpdir, "bench.log")
+
+import httpx  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+from app.main import app  # noqa: E402
+from app import models  # noqa: E402
+from app.database import Base, async_engine, engine  # noqa: E402
+from app.utils import create_access_token, utcnow  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+READER = 1
+ADMIN = 2
+# Each endpoint's query count, auth included (the user cache is warm after the first request).
+ENDPOINTS = {
+    "GET /borrowed/details": ("/borrowed/details", READER, 1),
+    "GET /borrowed": ("/borrowed", READER, 1),
+    "GET /borrowed?limit=100": ("/borrowed?limit=100", READER, 1),
+    "GET /holds": ("/holds", READER, 1),
+    "GET /admin/borrowing-history?limit=100": ("/admin/borrowing-history?limit=100", ADMIN, 1),
+    "GET /admin/users?limit=10": ("/admin/users?limit=10", ADMIN, 1),
+    "GET /admin/users?limit=100": ("/admin/users?limit=100", ADMIN, 1),
+}
+# Page sizes of one endpoint, checked against each other at every row count.
+SAME_COUNT = [
+    ("GET /borrowed", "GET /borrowed?limit=100"),
+    ("GET /admin/users?limit=10", "GET /admin/users?limit=100"),
+]
+
+statements = []
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def seed(rows: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    now = utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "-",
+             "is_active": True, "is_admin": i == ADMIN}
+            for i in range(1, rows + 3)
+        ])
+        conn.execute(insert(models.Book), [
+            {"id": i, "title": f"Book {i}", "author": "Bench", "isbn": f"978{i:010d}",
+             "total_copies": 1, "available_copies": 0}
+            for i in range(1, rows * 2 + 1)
+        ])
+        conn.execute(insert(models.BorrowedBook), [
+            {"user_id": READER, "book_id": i, "borrow_date": now - datetime.timedelta(hours=i),
+             "return_date": None if i % 3 == 0 else now, "due_date": now + datetime.timedelta(days=14)}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(insert(models.BookHold), [
+            {"user_id": READER, "book_id": rows + i, "status": "waiting", "created_at": now}
+            for i in range(1, rows + 1)
+        ])
+
+
+async def measure(client, rows: int) -> dict:
+    seed(rows)
+    counts = {}
+    for name, (path, user_id, _) in ENDPOINTS.items():
+        headers = {"Authorization": "Bearer " + create_access_token({"sub": f"user{user_id}"})}
+        # Warms the user cache, so the measured request only runs the endpoint's own queries.
+        (await client.get(path, headers=headers)).raise_for_status()
+        statements.clear()
+        response = await client.get(path, headers=headers)
+        response.raise_for_status()
+        counts[name] = {
+            "statements": len(statements),
+            "rows": len(response.json()),
+            "reads_password": any("password" in statement for statement in statements),
+        }
+    return counts
+
+
+async def main():
+    sizes = sorted({1, 10, args.loans})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        by_size = {rows: await measure(client, rows) for rows in sizes}
+    await async_engine.dispose()
+
+    report, failures = {}, []
+    for name, (_, _, expected) in ENDPOINTS.items():
+        counts = [by_size[rows][name]["statements"] for rows in sizes]
+        report[name] = {str(rows): by_size[rows][name] for rows in sizes}
+        if any(count != expected for count in counts):
+            failures.append(f"{name}: {counts} statements for {sizes} rows, expected {expected}")
+        if any(by_size[rows][name]["reads_password"] for rows in sizes):
+            failures.append(f"{name}: selects the password column")
+    for first, second in SAME_COUNT:
+        for rows in sizes:
+            counts = by_size[rows][first]["statements"], by_size[rows][second]["statements"]
+            if counts[0] != counts[1]:
+                failures.append(f"{first} and {second}: {counts[0]} vs {counts[1]} statements at {rows} rows")
+    print(json.dumps({"sizes": sizes, "endpoints": report, "failures": failures}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())